@@ -1,235 +1,664 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+from pymongo import DESCENDING
+from pymongo.errors import OperationFailure
 from bson.objectid import ObjectId
 from datetime import datetime
 import os
-import uuid
 import re
 import logging
-import pandas as pd
-from io import BytesIO
+import tempfile
+import hashlib
+import json
+import time
+import click
+from database import Database, mongo, config_from_env
+from archive import EditionArchiver, archive_name, current_edition
+from health import ReadinessProbe
+from json_provider import NDJSON_MIMETYPE, OrjsonProvider, ndjson_stream
+from metrics import add_metrics
+from change_feed import ChangeFeed, ChangeFeedError, decode_token
+from stats import StatsCache, dashboard_stats
+from response_cache import ResponseCache
+from search import TrigramIndex, query_terms, highlight
+from ingest_queue import IngestQueue
+from submissions import Submissions, after_write, new_student_doc
+from versions import DatasetVersions
+from input_validator import STUDENT_SCHEMA, INTERESTS, normalize_phone
+from duplicates import DuplicateDetector, blocking_keys
+from indexes import ensure_indexes
+from bulk_import import ImportFormatError, detect_format, iter_records, import_students
+from export import EXPORT_BATCH_SIZE, EXPORT_PROJECTION, XLSX_MIMETYPE, csv_stream, write_xlsx
+from export_jobs import ExportJobManager
+from rate_limiter import RateLimiter, rate_limit, MemoryBackend, MongoBackend
+from pagination import PaginationError, parse_limit, parse_fields, date_range_filter, decode_cursor, paginate, shaped
 
-app = Flask(__name__)
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-# Configure CORS
-official_origins = [
+api = Blueprint('api', __name__)
+
+OFFICIAL_ORIGINS = [
     "https://beninmathscamp.vercel.app",
     "http://localhost:5173",
     "http://localhost:3000"
 ]
-CORS(
-    app,
-    origins=official_origins,
-    methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "Cache-Control"],
-    max_age=86400
-)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+STUDENT_FIELDS = ['prenom','nom','email','telephone','age','niveau','ecole','ville','departement','commune','motivation','registeredAt','status','edition']
+STUDENT_STATUSES = frozenset(['pending','confirmed','rejected'])
+
+def serialize_student(s, fields=None):
+    out = {'id': str(s['_id'])}
+    for f in fields or STUDENT_FIELDS:
+        value = s.get(f)
+        out[f] = value.isoformat() if isinstance(value, datetime) else value
+    return out
+
+def edition_filter(value):
+    """Mongo condition for the comma-separated `edition` parameter, e.g. 2024,2025"""
+    try:
+        editions = [int(e) for e in value.split(',')]
+    except ValueError:
+        raise PaginationError('Édition invalide')
+    return editions[0] if len(editions) == 1 else {'$in': editions}
+
+def source_collection(name, args):
+    """Hot collection `name`, or its archive of past editions with `archive=true`"""
+    archived = args.get('archive', 'false').lower()
+    if archived not in ('true', 'false', '1', '0'):
+        raise PaginationError('Paramètre archive invalide')
+    return mongo.db[archive_name(name)] if archived in ('true', '1') else mongo.db[name]
+
+def student_filter(args):
+    """Build the Mongo filter for the student list query parameters"""
+    query = {}
+    if args.get('status'):
+        statuses = args['status'].split(',')
+        if any(st not in STUDENT_STATUSES for st in statuses):
+            raise PaginationError('Statut invalide')
+        query['status'] = statuses[0] if len(statuses) == 1 else {'$in': statuses}
+    for field in ('niveau', 'departement', 'commune'):
+        if args.get(field):
+            query[field] = args[field]
+    if args.get('edition'):
+        query['edition'] = edition_filter(args['edition'])
+    registered = date_range_filter(args.get('from'), args.get('to'))
+    if registered:
+        query['registeredAt'] = registered
+    return query
+
+MESSAGE_FIELDS = ['name','email','phone','interest','message','createdAt','status','edition']
+MESSAGE_STATUSES = frozenset(['new','read','replied'])
+MESSAGE_INTERESTS = INTERESTS
+
+def serialize_message(m, fields=None):
+    out = {'id': str(m['_id'])}
+    for f in fields or MESSAGE_FIELDS:
+        value = m.get(f)
+        out[f] = value.isoformat() if isinstance(value, datetime) else value
+    return out
+
+def message_filter(args):
+    """Build the Mongo filter for the message list query parameters"""
+    query = {}
+    for field, allowed in (('status', MESSAGE_STATUSES), ('interest', MESSAGE_INTERESTS)):
+        if args.get(field):
+            values = args[field].split(',')
+            if any(v not in allowed for v in values):
+                raise PaginationError(f'Valeur invalide pour {field}')
+            query[field] = values[0] if len(values) == 1 else {'$in': values}
+    if args.get('edition'):
+        query['edition'] = edition_filter(args['edition'])
+    created = date_range_filter(args.get('from'), args.get('to'))
+    if created:
+        query['createdAt'] = created
+    return query
+
+STUDENT_FILTER_PARAMS = ['status','niveau','departement','commune','edition','from','to']
+MESSAGE_FILTER_PARAMS = ['status','interest','edition','from','to']
+MAX_BULK_IDS = 1000
+# Fields searched (text index) and highlighted by /api/search
+SEARCH_FIELDS = {
+    'students': ['prenom','nom','ecole','ville','commune','motivation'],
+    'messages': ['name','email','message'],
+}
+SEARCH_MAX_RESULTS = 500
+DUPLICATE_STATUSES = frozenset(['open','dismissed','merged','resolved'])
+
+def parse_object_id(value):
+    return ObjectId(value)
+
+def parse_message_id(value):
+    if not isinstance(value, str) or not value:
+        raise ValueError(value)
+    return value
+
+def bulk_selector(data, parse_id, build_filter, filter_params):
+    """
+    Resolve the documents targeted by a batch request
+
+    The body either lists `ids` or gives a non-empty `filter` using the list
+    endpoint query parameters.
 
-# MongoDB Atlas configuration
-env_uri = os.environ.get('MONGODB_URI')
-if not env_uri:
-    logger.error('MONGODB_URI environment variable is not set')
-    raise RuntimeError('MONGODB_URI is required')
-
-try:
-    client = MongoClient(env_uri, serverSelectionTimeoutMS=5000)
-    # Trigger server selection to verify connection
-    client.server_info()
-except ServerSelectionTimeoutError as err:
-    logger.error(f"Unable to connect to MongoDB: {err}")
-    raise
-
-# Use default database from URI
-db = client.get_default_database()
-students_col = db.students
-messages_col = db.messages
-
-# Ensure unique index on student email
-try:
-    students_col.create_index([('email', ASCENDING)], unique=True)
-except Exception as idx_err:
-    logger.error(f"Could not create index on students.email: {idx_err}")
-
-# Validation and sanitization helpers
-
-def validate_email(email: str) -> bool:
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[A-Za-z]{2,}$'
-    return bool(email and isinstance(email, str) and re.match(pattern, email.strip()))
-
-def validate_phone(phone: str) -> bool:
-    if not phone:
-        return True
-    phone = phone.strip()
-    patterns = [
-        r'^\+229\s?[0-9]{8}$',   # +229 12345678
-        r'^[0-9]{8}$',           # 12345678
-        r'^\+?[0-9]{8,15}$'      # international
-    ]
-    return any(re.match(p, phone) for p in patterns)
-
-def sanitize_string(text: str, max_length: int = 1000) -> str:
-    if not isinstance(text, str):
-        return ''
-    # Remove control chars, angle brackets, quotes
-    sanitized = re.sub(r"[<>\"'\x00-\x1f\x7f-\x9f]", '', text)
-    return sanitized.strip()[:max_length]
+    Returns:
+        tuple: (Mongo filter, list of per-item errors for unparsable ids,
+            parsed ids or None for a filter)
+    """
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not ids:
+            raise PaginationError('ids doit être une liste non vide')
+        if len(ids) > MAX_BULK_IDS:
+            raise PaginationError(f'Au plus {MAX_BULK_IDS} ids par requête')
+        valid, invalid = [], []
+        for raw in ids:
+            try:
+                valid.append(parse_id(raw))
+            except Exception:
+                invalid.append({'id': raw, 'error': 'ID invalide'})
+        return {'_id': {'$in': valid}}, invalid, valid
+    criteria = data.get('filter')
+    if not isinstance(criteria, dict) or not any(criteria.get(k) for k in filter_params):
+        raise PaginationError('ids ou filter requis')
+    return build_filter({k: str(criteria[k]) for k in filter_params if criteria.get(k)}), [], None
+
+def missing_ids(collection, ids):
+    """Ids of a bulk request that match no document, [] for a filter"""
+    if not ids:
+        return []
+    found = {doc['_id'] for doc in collection.find({'_id': {'$in': ids}}, {'_id': 1})}
+    return list(dict.fromkeys(str(i) for i in ids if i not in found))
+JOB_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+def dataset_version(collection):
+    """Write counter of a collection (see versions.py), one lookup by _id"""
+    return current_app.extensions['versions'].get(collection.name)
+
+def normalized_query():
+    """Query string of the current request with its parameters in a canonical order"""
+    return sorted(request.args.items(multi=True))
+
+def request_etag(version):
+    """Strong ETag of the current GET request for a given dataset version"""
+    return hashlib.sha256(json.dumps([request.path, normalized_query(), version]).encode()).hexdigest()
+
+def not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def conditional_json(version, build):
+    """
+    Answer a list GET from its dataset version
+
+    304 when If-None-Match carries the current ETag, else the body rendered
+    for this ETag from the response cache, else build() which is only called
+    on a miss.
+
+    Args:
+        version: Dataset version of everything the body depends on
+        build: Callable returning the JSON response
+    """
+    etag = request_etag(version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    cache = current_app.extensions['response_cache']
+    key = json.dumps([request.path, normalized_query()])
+    body = cache.get(key, etag)
+    if body is None:
+        body = build().get_data()
+        cache.put(key, etag, body)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def parse_list_format(args, paginated):
+    """
+    True when a list is requested as NDJSON (`format=ndjson`)
+
+    NDJSON is meant for whole lists: it is streamed from the cursor, so it
+    does not combine with limit/after pagination.
+    """
+    list_format = args.get('format', 'json')
+    if list_format not in ('json', 'ndjson'):
+        raise PaginationError('Format invalide')
+    if list_format == 'ndjson' and paginated:
+        raise PaginationError('Le format ndjson renvoie toute la liste, sans limit ni after')
+    return list_format == 'ndjson'
+
+def conditional_ndjson(version, fetch):
+    """
+    NDJSON counterpart of conditional_json: 304 on a matching ETag, else one
+    line per document streamed from fetch(), without going through the response cache
+    """
+    etag = request_etag(version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    response = Response(stream_with_context(ndjson_stream(fetch())), mimetype=NDJSON_MIMETYPE)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Cache invalidation
+
+# Admin write endpoints and the collection they change; submissions run the same hooks from submissions.py
+WRITE_ENDPOINTS = {
+    **{f'api.{name}': 'students' for name in (
+        'bulk_register_students', 'bulk_update_student_status', 'bulk_delete_students',
+        'update_student_status', 'delete_student', 'merge_duplicate')},
+    **{f'api.{name}': 'messages' for name in (
+        'bulk_update_message_status', 'bulk_delete_messages', 'update_message_status', 'delete_message')},
+}
+
+@api.after_request
+def invalidate_caches(response):
+    # Any successful write to students or messages makes the cached dashboard and list bodies stale
+    if request.endpoint in WRITE_ENDPOINTS and response.status_code < 300:
+        after_write(current_app.extensions, WRITE_ENDPOINTS[request.endpoint])
+    return response
+
+def serialize_export_job(job):
+    out = {
+        'jobId': job['id'],
+        'format': job['format'],
+        'status': job['status'],
+        'cached': job['cached'],
+        'createdAt': datetime.utcfromtimestamp(job['createdAt']).isoformat(),
+        'finishedAt': datetime.utcfromtimestamp(job['finishedAt']).isoformat() if job['finishedAt'] else None,
+        'statusUrl': f"/api/export/jobs/{job['id']}",
+        'downloadUrl': f"/api/export/jobs/{job['id']}/download"
+    }
+    if job['error']:
+        out['error'] = job['error']
+    return out
 
 # Routes
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
+    ready, _, _ = current_app.extensions['readiness'].check()
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if ready else 'degraded',
         'message': 'API is running',
-        'timestamp': datetime.utcnow().isoformat(),
-        'students_count': students_col.count_documents({}),
-        'messages_count': messages_col.count_documents({})
+        'timestamp': datetime.utcnow().isoformat()
     })
 
-@app.route('/api/register', methods=['POST'])
-def register_student():
+@api.route('/api/health/live', methods=['GET'])
+def health_live():
+    return jsonify({'status': 'alive', 'timestamp': datetime.utcnow().isoformat()})
+
+@api.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    ready, error, age = current_app.extensions['readiness'].check()
+    body = {
+        'status': 'ready' if ready else 'unavailable',
+        'database': 'ok' if ready else 'unreachable',
+        'checkedSecondsAgo': round(age, 3),
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    return jsonify(body), 200 if ready else 503
+
+@api.route('/api/stats', methods=['GET'])
+def get_stats():
+    # One $facet aggregation per collection, cached for a few seconds
+    stats = current_app.extensions['stats'].get()
+    return jsonify({
+        **stats,
+        'students_count': stats['students']['total'],
+        'messages_count': stats['messages']['total']
+    })
+
+def submit(collection):
+    """Shared write path of the two public submission endpoints, see submissions.py"""
     if not request.is_json:
         return jsonify({'error': 'Content-Type must be application/json'}), 400
-    data = request.get_json()
-    required_fields = ['prenom','nom','email','telephone','age','niveau','ecole','ville','departement','commune','motivation']
-    missing = [f for f in required_fields if not data.get(f) or (isinstance(data.get(f),str) and not data[f].strip())]
-    if missing:
-        return jsonify({'error': f'Champs manquants: {", ".join(missing)}'}), 400
-
+    submissions = current_app.extensions['submissions']
+    doc, answer = submissions.prepare(collection, request.get_json(silent=True))
+    if answer is not None:
+        return jsonify(answer[1]), answer[0]
     try:
-        prenom = sanitize_string(data['prenom'],100)
-        nom = sanitize_string(data['nom'],100)
-        email = data['email'].strip().lower()
-        telephone = sanitize_string(data['telephone'],20)
-        age = int(data['age'])
-        if age<14 or age>18:
-            return jsonify({'error': "L'âge doit être entre 14 et 18 ans"}), 400
-        if not validate_email(email):
-            return jsonify({'error': "Format d'email invalide"}), 400
-        if not validate_phone(telephone):
-            return jsonify({'error': "Format de téléphone invalide"}), 400
-        niveau = data['niveau'].strip()
-        valid_niveaux = ['quatrieme','troisieme','seconde','premiere','terminale']
-        if niveau not in valid_niveaux:
-            return jsonify({'error': "Niveau scolaire invalide"}), 400
-        motivation = sanitize_string(data['motivation'],2000)
-        if len(motivation)<50:
-            return jsonify({'error': "La motivation doit contenir au moins 50 caractères"}), 400
+        mongo.db[collection].insert_one(doc)
     except Exception as e:
-        logger.error(f'Validation error: {e}')
-        return jsonify({'error': 'Données invalides'}), 400
-
-    student_doc = {
-        'prenom': prenom,
-        'nom': nom,
-        'email': email,
-        'telephone': telephone,
-        'age': age,
-        'niveau': niveau,
-        'ecole': sanitize_string(data['ecole'],200),
-        'ville': sanitize_string(data['ville'],100),
-        'departement': sanitize_string(data['departement'],100),
-        'commune': sanitize_string(data['commune'],100),
-        'motivation': motivation,
-        'registeredAt': datetime.utcnow(),
-        'status': 'pending'
+        status, body = submissions.failed(collection, e)
+    else:
+        status, body = submissions.stored(collection, doc)
+    return jsonify(body), status
+
+@api.route('/api/register', methods=['POST'])
+@rate_limit(window=60, setting='RATE_LIMIT_REGISTER')
+def register_student():
+    return submit('students')
+
+@api.route('/api/contact', methods=['POST'])
+@rate_limit(window=60, setting='RATE_LIMIT_CONTACT')
+def contact_message():
+    return submit('messages')
+
+@api.route('/api/search', methods=['GET'])
+def search():
+    q = (request.args.get('q') or '').strip()
+    kind = request.args.get('type', 'students')
+    if not q or len(q) > 200:
+        return jsonify({'error':'Paramètre q invalide'}), 400
+    if kind not in SEARCH_FIELDS:
+        return jsonify({'error':'Type de recherche invalide'}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'), default=20, maximum=100)
+        offset = int(request.args.get('offset') or 0)
+    except (PaginationError, ValueError):
+        return jsonify({'error':'Paramètres de pagination invalides'}), 400
+    if offset < 0 or offset >= SEARCH_MAX_RESULTS:
+        return jsonify({'error':'Paramètres de pagination invalides'}), 400
+
+    collection = mongo.students if kind == 'students' else mongo.messages
+    serialize = serialize_student if kind == 'students' else serialize_message
+    window = min(offset + limit, SEARCH_MAX_RESULTS)
+
+    # Stemmed full-text matches, scores scaled to [0, 1] against the best one
+    docs, ranking = {}, {}
+    try:
+        hits = list(
+            collection.find({'$text': {'$search': q}}, {'score': {'$meta': 'textScore'}})
+            .sort([('score', {'$meta': 'textScore'})])
+            .limit(window)
+        )
+    except OperationFailure as e:
+        logger.warning(f'Text search unavailable on {kind}: {e}')
+        hits = []
+    best = max((h['score'] for h in hits), default=0)
+    for h in hits:
+        docs[h['_id']] = h
+        ranking[h['_id']] = [h['score'] / best, ['text']]
+
+    # Accent-insensitive fuzzy matches on names, for typos the stemmer cannot fix
+    names = current_app.extensions['search_indexes'][kind]
+    names.refresh()
+    for doc_id, similarity in names.search(q, limit=window):
+        entry = ranking.setdefault(doc_id, [0, []])
+        entry[0] = max(entry[0], similarity)
+        entry[1].append('fuzzy')
+
+    ranked = sorted(ranking.items(), key=lambda item: (-item[1][0], str(item[0])))[:window]
+    page = ranked[offset:offset + limit]
+    missing = [doc_id for doc_id, _ in page if doc_id not in docs]
+    if missing:
+        docs.update((d['_id'], d) for d in collection.find({'_id': {'$in': missing}}))
+
+    terms = query_terms(q)
+    items = []
+    for doc_id, (score, matched_by) in page:
+        doc = docs.get(doc_id)
+        if doc is None:
+            # Deleted since the name index last refreshed
+            continue
+        highlights = {}
+        for field in SEARCH_FIELDS[kind]:
+            fragment = highlight(str(doc.get(field) or ''), terms)
+            if fragment:
+                highlights[field] = fragment
+        items.append({
+            'id': str(doc_id),
+            'score': round(score, 4),
+            'matchedBy': matched_by,
+            'document': serialize(doc),
+            'highlights': highlights
+        })
+    return jsonify({
+        'query': q,
+        'type': kind,
+        'items': items,
+        'offset': offset,
+        'limit': limit,
+        'nextOffset': offset + limit if offset + limit < len(ranked) else None
+    })
+
+@api.route('/api/submissions/<submission_id>', methods=['GET'])
+def get_submission(submission_id):
+    ingest_queue = current_app.extensions.get('ingest_queue')
+    info = ingest_queue.status(submission_id) if ingest_queue is not None else None
+    if not info:
+        return jsonify({'error':'Soumission non trouvée'}), 404
+    out = {
+        'submissionId': info['id'],
+        'type': 'student' if info['collection'] == 'students' else 'message',
+        'status': info['status'],
+        'receivedAt': datetime.utcfromtimestamp(info['createdAt']).isoformat()
     }
+    if info['error']:
+        out['error'] = info['error']
+    return jsonify(out)
+
+def serialize_change(event):
+    """Change feed event as sent to the admin console"""
+    out = {'type': event['type'], 'collection': event.get('collection')}
+    if 'id' in event:
+        out['id'] = str(event['id'])
+    document = event.get('document')
+    if document is not None and event['type'] != 'delete':
+        out['document'] = serialize_student(document) if event['collection'] == 'students' else serialize_message(document)
+    return out
+
+@api.route('/api/changes', methods=['GET'])
+def change_events():
+    # EventSource sends the id of the last event it received when it reconnects
+    token = request.headers.get('Last-Event-ID') or request.args.get('since')
     try:
-        res = students_col.insert_one(student_doc)
-        return jsonify({'message': 'Inscription enregistrée avec succès','studentId': str(res.inserted_id)}), 201
-    except DuplicateKeyError:
-        return jsonify({'error': 'Cette adresse email est déjà utilisée'}), 400
-    except Exception as e:
-        logger.error(f'Insert error: {e}')
-        return jsonify({'error': 'Erreur interne du serveur'}), 500
+        if token:
+            decode_token(token)
+    except ChangeFeedError as e:
+        return jsonify({'error': str(e)}), 400
+    feed = current_app.extensions['change_feed']
+    max_seconds = current_app.config['CHANGE_FEED_MAX_SECONDS']
+    heartbeat = current_app.config.get('CHANGE_FEED_HEARTBEAT', 15)
 
-@app.route('/api/contact', methods=['POST'])
-def contact_message():
-    if not request.is_json:
+    def stream():
+        # The connection is closed after max_seconds; the browser reconnects and resumes
+        yield 'retry: 3000\n\n'
+        last_sent = time.monotonic()
+        for event_token, event in feed.events(token, until=time.monotonic() + max_seconds):
+            if event is not None:
+                lines = f'id: {event_token}\n' if event_token else ''
+                yield f"{lines}event: change\ndata: {json.dumps(serialize_change(event))}\n\n"
+            elif event_token:
+                # Resume point without an event
+                yield f'id: {event_token}\n\n'
+            elif time.monotonic() - last_sent >= heartbeat:
+                yield ': ping\n\n'
+            else:
+                continue
+            last_sent = time.monotonic()
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api.route('/api/students/bulk', methods=['POST'])
+def bulk_register_students():
+    upload = request.files.get('file')
+    try:
+        if upload:
+            fmt = detect_format(upload.filename, upload.mimetype, request.args.get('format'))
+            stream = upload.stream
+        else:
+            fmt = detect_format(content_type=request.content_type, explicit=request.args.get('format'))
+            stream = request.stream
+        edition = current_edition(current_app.config['CAMP_EDITION'])
+        summary = import_students(mongo.students, iter_records(stream, fmt), STUDENT_SCHEMA,
+                                  lambda doc: new_student_doc(doc, edition))
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 400
+    if summary['rows'] == 0 and 'errorRow' not in summary:
+        return jsonify({'error': 'Aucune ligne à importer'}), 400
+    if 'errorRow' in summary:
+        # Rows before the unreadable one are stored; the after_request hook skips error responses.
+        # Either way after_write() hands the new students to the background duplicate scanner
+        if summary['inserted']:
+            after_write(current_app.extensions, 'students')
+        return jsonify({'error': f"Fichier illisible à partir de la ligne {summary['errorRow']}", **summary}), 400
+    return jsonify(summary), 200
+
+@api.route('/api/students/duplicates', methods=['GET'])
+def get_duplicates():
+    status = request.args.get('status', 'open')
+    if status not in DUPLICATE_STATUSES:
+        return jsonify({'error':'Statut invalide'}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        offset = int(request.args.get('offset') or 0)
+    except (PaginationError, ValueError):
+        return jsonify({'error':'Paramètres de pagination invalides'}), 400
+    if offset < 0:
+        return jsonify({'error':'Paramètres de pagination invalides'}), 400
+
+    # Catch up on students inserted without an inline check (imports, buffered or ASGI ingestion)
+    scanned, _ = current_app.extensions['duplicates'].scan(limit=current_app.config['DEDUP_SCAN_LIMIT'])
+    pairs = list(
+        mongo.duplicates.find({'status': status})
+        .sort([('score', DESCENDING), ('_id', 1)])
+        .skip(offset)
+        .limit(limit + 1)
+    )
+    has_more = len(pairs) > limit
+    pairs = pairs[:limit]
+    ids = list({student_id for pair in pairs for student_id in pair['students']})
+    students = {s['_id']: s for s in mongo.students.find({'_id': {'$in': ids}})}
+    return jsonify({
+        'items': [{
+            'id': pair['_id'],
+            'score': pair['score'],
+            'reasons': pair['reasons'],
+            'status': pair['status'],
+            'detectedAt': pair['detectedAt'].isoformat(),
+            'students': [serialize_student(students[i]) for i in pair['students'] if i in students]
+        } for pair in pairs],
+        'scanned': scanned,
+        'offset': offset,
+        'limit': limit,
+        'nextOffset': offset + limit if has_more else None
+    })
+
+@api.route('/api/students/duplicates/<pair_id>/status', methods=['PUT'])
+def update_duplicate_status(pair_id):
+    data = request.get_json(silent=True) or {}
+    if data.get('status') not in ('open', 'dismissed'):
+        return jsonify({'error':'Statut invalide'}), 400
+    res = mongo.duplicates.update_one({'_id': pair_id}, {'$set': {'status': data['status']}})
+    if res.matched_count == 0:
+        return jsonify({'error':'Doublon non trouvé'}), 404
+    return jsonify({'message':'Statut du doublon mis à jour'})
+
+@api.route('/api/students/duplicates/<pair_id>/merge', methods=['POST'])
+def merge_duplicate(pair_id):
+    data = request.get_json(silent=True) or {}
+    pair = mongo.duplicates.find_one({'_id': pair_id})
+    if not pair:
+        return jsonify({'error':'Doublon non trouvé'}), 404
+    ids = {str(i): i for i in pair['students']}
+    keep = ids.get(str(data.get('keep')))
+    if keep is None:
+        return jsonify({'error':'keep doit désigner un des deux étudiants'}), 400
+    drop = next(i for i in ids.values() if i != keep)
+    kept, dropped = mongo.students.find_one({'_id': keep}), mongo.students.find_one({'_id': drop})
+    now = datetime.utcnow()
+    if not kept or not dropped:
+        mongo.duplicates.update_one({'_id': pair_id}, {'$set': {'status': 'resolved', 'resolvedAt': now}})
+        return jsonify({'error':"Un des deux étudiants n'existe plus"}), 409
+
+    # Fields left empty on the kept registration are taken from the removed one
+    filled = {f: dropped[f] for f in STUDENT_FIELDS if not kept.get(f) and dropped.get(f)}
+    if filled:
+        merged = {**kept, **filled}
+        mongo.students.update_one({'_id': keep}, {'$set': {
+            **filled,
+            'telephoneNormalized': normalize_phone(merged.get('telephone')),
+            'dedupKeys': blocking_keys(merged)
+        }})
+    mongo.students.delete_one({'_id': drop})
+    mongo.duplicates.update_one({'_id': pair_id}, {'$set': {'status': 'merged', 'keptId': keep, 'resolvedAt': now}})
+    # Other pairs of the removed student are moot
+    mongo.duplicates.update_many({'students': drop, 'status': 'open'}, {'$set': {'status': 'resolved', 'resolvedAt': now}})
+    return jsonify({'message':'Doublon fusionné', 'keptId': str(keep), 'deletedId': str(drop), 'filled': sorted(filled)})
+
+@api.route('/api/students/status', methods=['PUT'])
+def bulk_update_student_status():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
         return jsonify({'error':'Content-Type must be application/json'}), 400
-    data = request.get_json()
-    required_fields = ['name','email','message','interest']
-    missing = [f for f in required_fields if not data.get(f) or (isinstance(data.get(f),str) and not data[f].strip())]
-    if missing:
-        return jsonify({'error': f'Champs manquants: {", ".join(missing)}'}), 400
+    if data.get('status') not in STUDENT_STATUSES:
+        return jsonify({'error':'Statut invalide'}), 400
     try:
-        name = sanitize_string(data['name'],100)
-        email = data['email'].strip().lower()
-        phone = sanitize_string(data.get('phone',''),20)
-        if not validate_email(email):
-            return jsonify({'error': "Format d'email invalide"}), 400
-        if phone and not validate_phone(phone):
-            return jsonify({'error': "Format de téléphone invalide"}), 400
-        interest = data['interest'].strip()
-        valid_interests = ['participant','parent','intervenant','partenaire']
-        if interest not in valid_interests:
-            return jsonify({'error': "Type d'intérêt invalide"}), 400
-        message = sanitize_string(data['message'],2000)
-        if len(message)<10:
-            return jsonify({'error': "Le message doit contenir au moins 10 caractères"}), 400
-    except Exception as e:
-        logger.error(f'Contact validation error: {e}')
-        return jsonify({'error': 'Données invalides'}), 400
-
-    contact_doc = {
-        '_id': str(uuid.uuid4()),
-        'name': name,
-        'email': email,
-        'phone': phone,
-        'interest': interest,
-        'message': message,
-        'createdAt': datetime.utcnow(),
-        'status': 'new'
-    }
+        query, invalid, ids = bulk_selector(data, parse_object_id, student_filter, STUDENT_FILTER_PARAMS)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    not_found = missing_ids(mongo.students, ids)
+    res = mongo.students.update_many(
+        query,
+        {'$set':{'status':data['status'],'statusUpdatedAt':datetime.utcnow()}}
+    )
+    return jsonify({'matched': res.matched_count, 'modified': res.modified_count, 'invalid': invalid, 'notFound': not_found})
+
+@api.route('/api/students', methods=['DELETE'])
+def bulk_delete_students():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error':'Content-Type must be application/json'}), 400
     try:
-        messages_col.insert_one(contact_doc)
-        return jsonify({'message':'Message envoyé avec succès','messageId': contact_doc['_id']}), 201
-    except Exception as e:
-        logger.error(f'Contact insert error: {e}')
-        return jsonify({'error':'Erreur lors de la sauvegarde'}), 500
+        query, invalid, ids = bulk_selector(data, parse_object_id, student_filter, STUDENT_FILTER_PARAMS)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    not_found = missing_ids(mongo.students, ids)
+    res = mongo.students.delete_many(query)
+    return jsonify({'deleted': res.deleted_count, 'invalid': invalid, 'notFound': not_found})
 
-@app.route('/api/students', methods=['GET'])
+@api.route('/api/students', methods=['GET'])
 def get_students():
-    docs = students_col.find().sort('registeredAt', DESCENDING)
-    out = []
-    for s in docs:
-        out.append({
-            'id': str(s['_id']),
-            'prenom': s['prenom'],
-            'nom': s['nom'],
-            'email': s['email'],
-            'telephone': s['telephone'],
-            'age': s['age'],
-            'niveau': s['niveau'],
-            'ecole': s['ecole'],
-            'ville': s['ville'],
-            'departement': s['departement'],
-            'commune': s['commune'],
-            'motivation': s['motivation'],
-            'registeredAt': s['registeredAt'].isoformat(),
-            'status': s['status']
+    try:
+        query = student_filter(request.args)
+        collection = source_collection('students', request.args)
+        fields = parse_fields(request.args.get('fields'), STUDENT_FIELDS) or STUDENT_FIELDS
+        paginated = 'limit' in request.args or 'after' in request.args
+        limit = parse_limit(request.args.get('limit'))
+        if request.args.get('after'):
+            decode_cursor(request.args['after'])
+        ndjson = parse_list_format(request.args, paginated)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if ndjson:
+        return conditional_ndjson(dataset_version(collection), lambda: shaped(collection, query, 'registeredAt', fields))
+
+    def build():
+        if not paginated:
+            # Unpaginated calls keep returning the full list as a bare array
+            return jsonify(list(shaped(collection, query, 'registeredAt', fields)))
+        docs, next_cursor = paginate(collection, query, 'registeredAt', limit,
+                                     after=request.args.get('after'), fields=fields)
+        return jsonify({
+            'items': docs,
+            'nextCursor': next_cursor,
+            'limit': limit
         })
-    return jsonify(out)
 
-@app.route('/api/students/<student_id>/status', methods=['PUT'])
+    return conditional_json(dataset_version(collection), build)
+
+@api.route('/api/students/<student_id>/status', methods=['PUT'])
 def update_student_status(student_id):
     if not request.is_json:
         return jsonify({'error':'Content-Type must be application/json'}), 400
     data = request.get_json()
     new_status = data.get('status')
-    if new_status not in ['pending','confirmed','rejected']:
+    if new_status not in STUDENT_STATUSES:
         return jsonify({'error':'Statut invalide'}), 400
     try:
         oid = ObjectId(student_id)
     except:
         return jsonify({'error':'ID invalide'}), 400
-    res = students_col.update_one(
+    res = mongo.students.update_one(
         {'_id':oid},
         {'$set':{'status':new_status,'statusUpdatedAt':datetime.utcnow()}}
     )
@@ -237,43 +666,87 @@ def update_student_status(student_id):
         return jsonify({'error':'Étudiant non trouvé'}), 404
     return jsonify({'message':'Statut mis à jour avec succès'})
 
-@app.route('/api/students/<student_id>', methods=['DELETE'])
+@api.route('/api/students/<student_id>', methods=['DELETE'])
 def delete_student(student_id):
     try:
         oid = ObjectId(student_id)
     except:
         return jsonify({'error':'ID invalide'}), 400
-    res = students_col.delete_one({'_id':oid})
+    res = mongo.students.delete_one({'_id':oid})
     if res.deleted_count==0:
         return jsonify({'error':'Étudiant non trouvé'}), 404
     return jsonify({'message':'Étudiant supprimé avec succès'})
 
-@app.route('/api/messages', methods=['GET'])
+@api.route('/api/messages/status', methods=['PUT'])
+def bulk_update_message_status():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error':'Content-Type must be application/json'}), 400
+    if data.get('status') not in MESSAGE_STATUSES:
+        return jsonify({'error':'Statut invalide'}), 400
+    try:
+        query, invalid, ids = bulk_selector(data, parse_message_id, message_filter, MESSAGE_FILTER_PARAMS)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    not_found = missing_ids(mongo.messages, ids)
+    res = mongo.messages.update_many(
+        query,
+        {'$set':{'status':data['status'],'statusUpdatedAt':datetime.utcnow()}}
+    )
+    return jsonify({'matched': res.matched_count, 'modified': res.modified_count, 'invalid': invalid, 'notFound': not_found})
+
+@api.route('/api/messages', methods=['DELETE'])
+def bulk_delete_messages():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error':'Content-Type must be application/json'}), 400
+    try:
+        query, invalid, ids = bulk_selector(data, parse_message_id, message_filter, MESSAGE_FILTER_PARAMS)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    not_found = missing_ids(mongo.messages, ids)
+    res = mongo.messages.delete_many(query)
+    return jsonify({'deleted': res.deleted_count, 'invalid': invalid, 'notFound': not_found})
+
+@api.route('/api/messages', methods=['GET'])
 def get_messages():
-    docs = messages_col.find().sort('createdAt', DESCENDING)
-    out = []
-    for m in docs:
-        out.append({
-            'id': str(m['_id']),
-            'name': m['name'],
-            'email': m['email'],
-            'phone': m['phone'],
-            'interest': m['interest'],
-            'message': m['message'],
-            'createdAt': m['createdAt'].isoformat(),
-            'status': m['status']
+    try:
+        query = message_filter(request.args)
+        collection = source_collection('messages', request.args)
+        fields = parse_fields(request.args.get('fields'), MESSAGE_FIELDS) or MESSAGE_FIELDS
+        paginated = 'limit' in request.args or 'after' in request.args
+        limit = parse_limit(request.args.get('limit'))
+        if request.args.get('after'):
+            decode_cursor(request.args['after'])
+        ndjson = parse_list_format(request.args, paginated)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if ndjson:
+        return conditional_ndjson(dataset_version(collection), lambda: shaped(collection, query, 'createdAt', fields))
+
+    def build():
+        if not paginated:
+            return jsonify(list(shaped(collection, query, 'createdAt', fields)))
+        docs, next_cursor = paginate(collection, query, 'createdAt', limit,
+                                     after=request.args.get('after'), fields=fields)
+        return jsonify({
+            'items': docs,
+            'nextCursor': next_cursor,
+            'limit': limit
         })
-    return jsonify(out)
 
-@app.route('/api/messages/<message_id>/status', methods=['PUT'])
+    return conditional_json(dataset_version(collection), build)
+
+@api.route('/api/messages/<message_id>/status', methods=['PUT'])
 def update_message_status(message_id):
     if not request.is_json:
         return jsonify({'error':'Content-Type must be application/json'}), 400
     data = request.get_json()
     new_status = data.get('status')
-    if new_status not in ['new','read','replied']:
+    if new_status not in MESSAGE_STATUSES:
         return jsonify({'error':'Statut invalide'}), 400
-    res = messages_col.update_one(
+    res = mongo.messages.update_one(
         {'_id':message_id},
         {'$set':{'status':new_status,'statusUpdatedAt':datetime.utcnow()}}
     )
@@ -281,67 +754,314 @@ def update_message_status(message_id):
         return jsonify({'error':'Message non trouvé'}), 404
     return jsonify({'message':'Statut du message mis à jour avec succès'})
 
-@app.route('/api/messages/<message_id>', methods=['DELETE'])
+@api.route('/api/messages/<message_id>', methods=['DELETE'])
 def delete_message(message_id):
-    res = messages_col.delete_one({'_id':message_id})
+    res = mongo.messages.delete_one({'_id':message_id})
     if res.deleted_count==0:
         return jsonify({'error':'Message non trouvé'}), 404
     return jsonify({'message':'Message supprimé avec succès'})
 
-@app.route('/api/export/students', methods=['GET'])
+@api.route('/api/export/students', methods=['GET'])
 def export_students():
-    docs = students_col.find().sort('registeredAt', DESCENDING)
-    rows = []
-    for s in docs:
-        rows.append({
-            'ID': str(s['_id']),
-            'Prénom': s['prenom'],
-            'Nom': s['nom'],
-            'Email': s['email'],
-            'Téléphone': s['telephone'],
-            'Âge': s['age'],
-            'Niveau': s['niveau'],
-            'École': s['ecole'],
-            'Ville': s['ville'],
-            'Département': s['departement'],
-            'Commune': s['commune'],
-            'Motivation': s['motivation'],
-            'Date d\'inscription': s['registeredAt'].isoformat(),
-            'Statut': s['status']
-        })
-    if not rows:
+    export_format = request.args.get('format', 'xlsx')
+    if export_format not in ('xlsx', 'csv', 'ndjson'):
+        return jsonify({'error': "Format d'export invalide"}), 400
+    try:
+        query = student_filter(request.args)
+        collection = source_collection('students', request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    etag = request_etag(dataset_version(collection))
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    if collection.find_one(query, {'_id': 1}) is None:
+        return jsonify({'error':'Aucun étudiant à exporter'}), 404
+
+    fname = f"inscriptions_summer_maths_camp_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    # Only the exported columns: dedup keys and other internal fields are not read
+    docs = (collection.find(query, EXPORT_PROJECTION)
+            .sort([('registeredAt', DESCENDING), ('_id', DESCENDING)]).batch_size(EXPORT_BATCH_SIZE))
+    if export_format == 'ndjson':
+        # Documents in the API form of GET /api/students, one per line
+        response = Response(
+            stream_with_context(ndjson_stream(shaped(collection, query, 'registeredAt', STUDENT_FIELDS))),
+            mimetype=NDJSON_MIMETYPE,
+            headers={'Content-Disposition': f'attachment; filename={fname}'}
+        )
+    elif export_format == 'csv':
+        response = Response(
+            stream_with_context(csv_stream(docs)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={fname}'}
+        )
+    else:
+        # Spooled to disk and removed once the response is closed
+        out = write_xlsx(docs, tempfile.TemporaryFile())
+        response = send_file(
+            out,
+            mimetype=XLSX_MIMETYPE,
+            as_attachment=True,
+            download_name=fname,
+            etag=False
+        )
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api.route('/api/export/jobs', methods=['POST'])
+def create_export_job():
+    data = request.get_json(silent=True) or {}
+    export_format = data.get('format', 'xlsx')
+    if export_format not in ('xlsx', 'csv'):
+        return jsonify({'error': "Format d'export invalide"}), 400
+    filters = {k: str(data[k]) for k in STUDENT_FILTER_PARAMS if data.get(k)}
+    try:
+        query = student_filter(filters)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    if mongo.students.find_one(query, {'_id': 1}) is None:
         return jsonify({'error':'Aucun étudiant à exporter'}), 404
-    df = pd.DataFrame(rows)
-    out = BytesIO()
-    with pd.ExcelWriter(out, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Inscriptions', index=False)
-    out.seek(0)
-    fname = f"inscriptions_summer_maths_camp_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+    version = json.dumps([export_format, filters, dataset_version(mongo.students)], sort_keys=True)
+    key = hashlib.sha256(version.encode()).hexdigest()[:32]
+
+    # Resolved now: build() runs on a pool thread, outside the app context
+    students = mongo.students
+
+    def build(fileobj):
+        docs = students.find(query, EXPORT_PROJECTION).sort([('registeredAt', DESCENDING), ('_id', DESCENDING)]).batch_size(EXPORT_BATCH_SIZE)
+        if export_format == 'csv':
+            for chunk in csv_stream(docs):
+                fileobj.write(chunk)
+        else:
+            write_xlsx(docs, fileobj)
+
+    job = current_app.extensions['export_jobs'].submit(key, export_format, build)
+    return jsonify(serialize_export_job(job)), 200 if job['status'] == 'done' else 202
+
+@api.route('/api/export/jobs/<job_id>', methods=['GET'])
+def get_export_job(job_id):
+    job = current_app.extensions['export_jobs'].get(job_id) if JOB_ID_RE.fullmatch(job_id) else None
+    if not job:
+        return jsonify({'error':'Export non trouvé'}), 404
+    return jsonify(serialize_export_job(job))
+
+@api.route('/api/export/jobs/<job_id>/download', methods=['GET'])
+def download_export_job(job_id):
+    if not JOB_ID_RE.fullmatch(job_id):
+        return jsonify({'error':'Export non trouvé'}), 404
+    export_jobs = current_app.extensions['export_jobs']
+    job = export_jobs.get(job_id)
+    if job and job['status'] in ('queued', 'running'):
+        return jsonify({'error':"L'export n'est pas encore prêt"}), 409
+    path, ext = export_jobs.find_artifact(job_id)
+    if not path:
+        return jsonify({'error':'Export non trouvé'}), 404
+    fname = f"inscriptions_summer_maths_camp_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{ext}"
     return send_file(
-        out,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        path,
+        mimetype=XLSX_MIMETYPE if ext == 'xlsx' else 'text/csv',
         as_attachment=True,
         download_name=fname
     )
 
 # Error handlers
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(err):
     return jsonify({'error':'Endpoint non trouvé'}), 404
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(err):
     return jsonify({'error':'Erreur interne du serveur'}), 500
 
-@app.errorhandler(400)
+@api.app_errorhandler(400)
 def bad_request(err):
     return jsonify({'error':'Requête invalide'}), 400
 
-@app.errorhandler(405)
+@api.app_errorhandler(405)
 def method_not_allowed(err):
     return jsonify({'error':'Méthode non autorisée'}), 405
 
+def settings_from_env():
+    """Application settings read from the environment, every one overridable by create_app(config)"""
+    env = os.environ.get
+    return {
+        # Edition of new submissions; the current year when unset
+        'CAMP_EDITION': int(env('CAMP_EDITION')) if env('CAMP_EDITION') else None,
+        'RATE_LIMIT_REGISTER': int(env('RATE_LIMIT_REGISTER', 20)),
+        'RATE_LIMIT_CONTACT': int(env('RATE_LIMIT_CONTACT', 10)),
+        # Reverse proxies in front of the app (Render adds one) and rate limiting granularity
+        'TRUSTED_PROXY_HOPS': int(env('TRUSTED_PROXY_HOPS', 1)),
+        'CLIENT_IPV4_PREFIX': int(env('CLIENT_IPV4_PREFIX', 32)),
+        'CLIENT_IPV6_PREFIX': int(env('CLIENT_IPV6_PREFIX', 64)),
+        'RATE_LIMIT_BACKEND': env('RATE_LIMIT_BACKEND', 'mongo'),
+        'HEALTH_READY_TTL': float(env('HEALTH_READY_TTL', 10)),
+        'STATS_CACHE_TTL': float(env('STATS_CACHE_TTL', 30)),
+        'STATS_CACHE_MIN_AGE': float(env('STATS_CACHE_MIN_AGE', 5)),
+        'RESPONSE_CACHE_ENTRIES': int(env('RESPONSE_CACHE_ENTRIES', 256)),
+        'RESPONSE_CACHE_MAX_BYTES': int(env('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+        'CHANGE_FEED_MODE': env('CHANGE_FEED_MODE', 'auto'),
+        'CHANGE_FEED_POLL_INTERVAL': float(env('CHANGE_FEED_POLL_INTERVAL', 2)),
+        'CHANGE_FEED_MAX_SECONDS': int(env('CHANGE_FEED_MAX_SECONDS', 60)),
+        'SEARCH_INDEX_TTL': float(env('SEARCH_INDEX_TTL', 5)),
+        'DEDUP_THRESHOLD': float(env('DEDUP_THRESHOLD', 0.65)),
+        'DEDUP_SCAN_LIMIT': int(env('DEDUP_SCAN_LIMIT', 2000)),
+        'EXPORT_DIR': env('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'msc_exports')),
+        'EXPORT_WORKERS': int(env('EXPORT_WORKERS', 2)),
+        'EXPORT_CACHE_MAX_BYTES': int(env('EXPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024)),
+        'EXPORT_CACHE_MAX_AGE': int(env('EXPORT_CACHE_MAX_AGE', 24 * 3600)),
+        'INGEST_MODE': env('INGEST_MODE', 'direct'),
+        'INGEST_JOURNAL': env('INGEST_JOURNAL', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ingest_journal.sqlite3')),
+        'INGEST_BATCH_SIZE': int(env('INGEST_BATCH_SIZE', 500)),
+        'METRICS_DIR': env('METRICS_DIR'),
+        'PROFILE_SAMPLE_RATE': float(env('PROFILE_SAMPLE_RATE', 0)),
+        'PROFILE_DIR': env('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'camp-profiles')),
+    }
+
+def create_app(config=None):
+    """
+    Build the Flask application
+
+    Nothing here touches the network: MongoDB is connected on first use, and
+    indexes are created by the `ensure-indexes` command, not at startup.
+    Each app gets its own database handle and rate limiter in app.extensions,
+    so building a second app (tests, benchmarks) leaves the first one alone.
+
+    Args:
+        config: Settings overriding the ones read from the environment
+    """
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    app.config.update(config_from_env())
+    app.config.update(settings_from_env())
+    if config:
+        app.config.update(config)
+
+    # Configure CORS
+    CORS(
+        app,
+        origins=OFFICIAL_ORIGINS,
+        methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["Content-Type", "Authorization", "Accept", "Cache-Control"],
+        max_age=86400
+    )
+
+    # Before database.init_app(), which hands the Mongo command listener to the client
+    add_metrics(app)
+    database = Database()
+    database.init_app(app)
+
+    # Rate limit counters live in MongoDB so limits hold across gunicorn workers and nodes
+    if app.config['RATE_LIMIT_BACKEND'] == 'mongo':
+        app.extensions['rate_limiter'] = RateLimiter(MongoBackend(lambda: database.rate_limits))
+    else:
+        app.extensions['rate_limiter'] = RateLimiter(MemoryBackend())
+
+    # Cached database ping shared by the health endpoints
+    app.extensions['readiness'] = ReadinessProbe(
+        lambda: database.client.admin.command('ping'),
+        ttl=app.config['HEALTH_READY_TTL']
+    )
+
+    # Dashboard counters, recomputed every STATS_CACHE_TTL seconds, or STATS_CACHE_MIN_AGE after a write
+    app.extensions['stats'] = StatsCache(
+        lambda: dashboard_stats(database.db),
+        ttl=app.config['STATS_CACHE_TTL'],
+        min_age=app.config['STATS_CACHE_MIN_AGE']
+    )
+
+    # Write counters of students and messages, behind the list and export ETags
+    app.extensions['versions'] = DatasetVersions(lambda: database.db.versions)
+
+    # Rendered list bodies, validated against the dataset version on every hit
+    app.extensions['response_cache'] = ResponseCache(
+        max_entries=app.config['RESPONSE_CACHE_ENTRIES'],
+        max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES']
+    )
+
+    # Change events for the admin console: change streams when available, polling otherwise
+    app.extensions['change_feed'] = ChangeFeed(
+        lambda: database.db,
+        mode=app.config['CHANGE_FEED_MODE'],
+        poll_interval=app.config['CHANGE_FEED_POLL_INTERVAL']
+    )
+
+    # Per-process trigram indexes behind the fuzzy part of /api/search
+    search_ttl = app.config['SEARCH_INDEX_TTL']
+    app.extensions['search_indexes'] = {
+        'students': TrigramIndex(lambda: database.students, ['prenom', 'nom'], 'registeredAt', ttl=search_ttl),
+        'messages': TrigramIndex(lambda: database.messages, ['name'], 'createdAt', ttl=search_ttl),
+    }
+
+    # Near-duplicate applicants, compared within blocks sharing a phone, name or email key
+    app.extensions['duplicates'] = DuplicateDetector(
+        lambda: database.students,
+        lambda: database.duplicates,
+        threshold=app.config['DEDUP_THRESHOLD']
+    )
+
+    # Background export jobs with artifacts cached on disk
+    app.extensions['export_jobs'] = ExportJobManager(
+        app.config['EXPORT_DIR'],
+        max_workers=app.config['EXPORT_WORKERS'],
+        max_bytes=app.config['EXPORT_CACHE_MAX_BYTES'],
+        max_age=app.config['EXPORT_CACHE_MAX_AGE']
+    )
+
+    # Optional write-behind ingestion: submissions are journaled locally and group-committed
+    if app.config['INGEST_MODE'] == 'buffered':
+        ingest_queue = IngestQueue(
+            app.config['INGEST_JOURNAL'],
+            lambda name: database.db[name],
+            batch_size=app.config['INGEST_BATCH_SIZE'],
+            # Caches go stale when the documents are stored, not when they are journaled
+            on_stored=lambda name: after_write(app.extensions, name)
+        )
+        app.extensions['ingest_queue'] = ingest_queue
+
+        @app.before_request
+        def start_ingest_flusher():
+            # Threads do not survive a fork, so each worker starts its own flusher
+            ingest_queue.start()
+
+    # Write path of /api/register and /api/contact, shared with the ASGI app
+    app.extensions['submissions'] = Submissions(app.config, app.extensions)
+
+    app.register_blueprint(api)
+
+    @app.cli.command('ensure-indexes')
+    def ensure_indexes_command():
+        """Create the MongoDB indexes the API relies on."""
+        # Ensure unique email index and the compound indexes behind list queries
+        ensure_indexes(database.db)
+        click.echo('MongoDB indexes are up to date')
+
+    @app.cli.command('scan-duplicates')
+    def scan_duplicates_command():
+        """Check every student not yet compared with its duplicate blocks."""
+        checked, found = app.extensions['duplicates'].scan()
+        click.echo(f'{checked} students checked, {found} candidate pairs')
+
+    @app.cli.command('archive-editions')
+    @click.option('--before', type=int, default=None, help='First edition kept, the current one by default.')
+    @click.option('--to-files', 'directory', default=None, help='Write .jsonl.gz files there instead of archive collections.')
+    @click.option('--batch-size', type=int, default=1000)
+    def archive_editions_command(before, directory, batch_size):
+        """Move students and messages of past editions out of the hot collections."""
+        before = before or current_edition(app.config['CAMP_EDITION'])
+        moved = EditionArchiver(lambda: database.db, batch_size).archive(before, directory)
+        for name in moved:
+            app.extensions['versions'].bump(name)
+            app.extensions['versions'].bump(archive_name(name))
+        for name, counts in moved.items():
+            detail = ', '.join(f'{edition}: {count}' for edition, count in sorted(counts.items())) or 'nothing to move'
+            click.echo(f'{name} before {before}: {detail}')
+
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') != 'production'
@@ -0,0 +1,117 @@
+import os
+import gzip
+import logging
+from datetime import datetime
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Collections split by edition and the timestamp set when a document is inserted
+ARCHIVED_COLLECTIONS = {'students': 'registeredAt', 'messages': 'createdAt'}
+
+DUPLICATE_KEY_ERROR = 11000
+
+def current_edition(configured=None):
+    """Camp edition new documents belong to: `configured` (the CAMP_EDITION setting), else the current year"""
+    return int(configured or datetime.utcnow().year)
+
+def archive_name(name):
+    return f'{name}_archive'
+
+class EditionArchiver:
+    def __init__(self, get_db, batch_size=1000):
+        """
+        Moves the documents of past camp editions out of the hot collections
+
+        Students and messages carry the `edition` they were submitted for.
+        Past editions go either to `students_archive` / `messages_archive`,
+        still readable through the API with `archive=true`, or to gzipped
+        extended JSON Lines files (one per collection and edition) that
+        `mongoimport` can load back. Each batch is copied before it is
+        deleted, so an interrupted run can be restarted: archive collections
+        skip the documents they already hold, files may get them twice.
+
+        Args:
+            get_db: Callable returning the Mongo database
+            batch_size: Documents moved per round trip
+        """
+        self.get_db = get_db
+        self.batch_size = batch_size
+
+    def backfill(self, name, field):
+        """
+        Set `edition` on documents stored before the field existed, from the year of `field`
+
+        Returns:
+            int: Number of documents updated
+        """
+        collection = self.get_db()[name]
+        oldest = collection.find_one({'edition': None, field: {'$ne': None}}, {field: 1}, sort=[(field, 1)])
+        if oldest is None:
+            return 0
+        updated = 0
+        for year in range(oldest[field].year, datetime.utcnow().year + 1):
+            updated += collection.update_many(
+                {'edition': None, field: {'$gte': datetime(year, 1, 1), '$lt': datetime(year + 1, 1, 1)}},
+                {'$set': {'edition': year}}
+            ).modified_count
+        return updated
+
+    def archive(self, before, directory=None):
+        """
+        Move every document of an edition older than `before`
+
+        Args:
+            before: First edition kept in the hot collections
+            directory: Write .jsonl.gz files there instead of archive collections
+
+        Returns:
+            dict: {collection: {edition: documents moved}}
+        """
+        db = self.get_db()
+        moved = {}
+        for name, field in ARCHIVED_COLLECTIONS.items():
+            self.backfill(name, field)
+            hot = db[name]
+            counts = moved[name] = {}
+            while True:
+                batch = list(hot.find({'edition': {'$lt': before}}).limit(self.batch_size))
+                if not batch:
+                    break
+                if directory:
+                    self._write_files(directory, name, batch)
+                else:
+                    self._insert(db[archive_name(name)], batch)
+                ids = [doc['_id'] for doc in batch]
+                hot.delete_many({'_id': {'$in': ids}})
+                if name == 'students':
+                    # Candidate pairs of a past edition will never be reviewed
+                    db.duplicates.delete_many({'students': {'$in': ids}})
+                for doc in batch:
+                    counts[doc['edition']] = counts.get(doc['edition'], 0) + 1
+            if counts:
+                logger.info(f'Archived {name}: {counts}')
+        return moved
+
+    def _insert(self, collection, batch):
+        try:
+            collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Already copied by an interrupted run
+            if any(err.get('code') != DUPLICATE_KEY_ERROR for err in e.details.get('writeErrors', [])):
+                raise
+
+    def _write_files(self, directory, name, batch):
+        os.makedirs(directory, exist_ok=True)
+        by_edition = {}
+        for doc in batch:
+            by_edition.setdefault(doc['edition'], []).append(doc)
+        for edition, docs in by_edition.items():
+            lines = ''.join(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + '\n' for doc in docs)
+            # Appended as a new gzip member; flushed to disk before the documents are deleted
+            with open(os.path.join(directory, f'{name}_{edition}.jsonl.gz'), 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+                    f.write(lines.encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
@@ -0,0 +1,196 @@
+"""
+ASGI variant of the two public write endpoints
+
+POST /api/register and POST /api/contact are served on an asyncio event loop
+with PyMongo's AsyncMongoClient, so hundreds of concurrent submissions share
+one process instead of holding one worker thread each: the insert and the
+version bump are awaited, and nothing else on the path does network I/O. Validation, documents,
+buffered ingestion, the near-duplicate check and the cache hooks come from
+submissions.py, like the Flask routes in app.py; requests are counted in the
+Flask app's metrics under the same series. Every other path is forwarded to
+the Flask app, so this module can replace `gunicorn app:app` entirely:
+
+    uvicorn asgi_ingest:app --host 0.0.0.0 --port $PORT --workers 2
+"""
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from asgiref.wsgi import WsgiToAsgi
+from pymongo import AsyncMongoClient
+from app import OFFICIAL_ORIGINS, create_app
+from client_address import resolve_client_ip, aggregate_ip
+from database import client_options
+from json_provider import dumps_bytes
+from metrics import record_request
+from rate_limiter import RateLimiter, MemoryBackend, AsyncMongoBackend
+from submissions import log_bump_error
+from versions import DatasetVersions
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+
+class IngestApp:
+    def __init__(self, flask_app, fallback=None):
+        """
+        Args:
+            flask_app: Flask app whose config (MongoDB, proxy and rate limiting
+                settings), submission write path and metrics are used
+            fallback: ASGI app receiving every request not handled here
+        """
+        self.config = flask_app.config
+        self.submissions = flask_app.extensions['submissions']
+        self.metrics = flask_app.extensions['metrics']
+        self.fallback = fallback
+        self.client = None
+        self.versions = DatasetVersions(lambda: self.db.versions)
+        self.journal_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-journal')
+        if self.config.get('RATE_LIMIT_BACKEND', 'mongo') == 'mongo':
+            self.limiter = RateLimiter(AsyncMongoBackend(lambda: self.db.rate_limits))
+        else:
+            self.limiter = RateLimiter(MemoryBackend())
+        # Same bucket names as the Flask endpoints, so both paths share limits
+        self.routes = {
+            '/api/register': ('students', 'api.register_student', self.config['RATE_LIMIT_REGISTER']),
+            '/api/contact': ('messages', 'api.contact_message', self.config['RATE_LIMIT_CONTACT']),
+        }
+
+    @property
+    def db(self):
+        # The async client binds to the running event loop, so it is created on first use
+        if self.client is None:
+            if not self.config.get('MONGODB_URI'):
+                raise RuntimeError('MONGODB_URI is required')
+            self.client = AsyncMongoClient(self.config['MONGODB_URI'], **client_options(self.config))
+        return self.client.get_default_database()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        route = self.routes.get(scope.get('path')) if scope['type'] == 'http' else None
+        if route is None:
+            if self.fallback is not None:
+                await self.fallback(scope, receive, send)
+            else:
+                await self.respond(send, scope, 404, {'error': 'Endpoint non trouvé'})
+            return
+
+        started = time.perf_counter()
+        status, payload = await self.handle(scope, receive, route)
+        size = await self.respond(send, scope, status, payload)
+        record_request(self.metrics, scope['method'], scope['path'], status, time.perf_counter() - started, size)
+        self.metrics.flush()
+
+    async def handle(self, scope, receive, route):
+        """
+        Returns:
+            tuple: (status, JSON payload or None) of the response
+        """
+        collection, bucket, limit = route
+        if scope['method'] == 'OPTIONS':
+            return 200, None
+        if scope['method'] != 'POST':
+            return 405, {'error': 'Méthode non autorisée'}
+        client_key = self.client_key(scope)
+        if not await self.limiter.is_allowed_async(f'{bucket}:{client_key}', limit, 60):
+            logger.warning(f'Rate limit exceeded on {bucket} for {client_key}')
+            return 429, {'error': 'Trop de requêtes'}
+
+        headers = dict(scope['headers'])
+        mimetype = headers.get(b'content-type', b'').decode('latin-1').split(';')[0].strip().lower()
+        if not (mimetype == 'application/json' or mimetype.endswith('+json')):
+            return 400, {'error': 'Content-Type must be application/json'}
+        body = await self.read_body(receive)
+        if body is None:
+            return 413, {'error': 'Requête trop volumineuse'}
+        try:
+            data = orjson.loads(body)
+        except ValueError:
+            data = None
+        return await self.submit(collection, data)
+
+    async def submit(self, collection, data):
+        """Same write path as app.submit(), with an awaited insert"""
+        submissions = self.submissions
+        if submissions.ingest_queue is not None:
+            # Journaled into the local SQLite file, off the event loop. SQLite takes one writer
+            # at a time anyway, so one thread is enough and the default executor stays free
+            doc, answer = await asyncio.get_running_loop().run_in_executor(
+                self.journal_executor, submissions.prepare, collection, data)
+        else:
+            doc, answer = submissions.prepare(collection, data)
+        if answer is not None:
+            return answer
+        try:
+            await self.db[collection].insert_one(doc)
+        except Exception as e:
+            return submissions.failed(collection, e)
+        try:
+            await self.versions.bump_async(collection)
+        except Exception as e:
+            log_bump_error(collection, e)
+        # Cache invalidation and waking the duplicate scanner, no I/O left
+        return submissions.stored(collection, doc, bump=False)
+
+    def client_key(self, scope):
+        headers = dict(scope['headers'])
+        environ = {
+            'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+            'HTTP_X_FORWARDED_FOR': headers.get(b'x-forwarded-for', b'').decode('latin-1'),
+        }
+        ip = resolve_client_ip(environ, self.config.get('TRUSTED_PROXY_HOPS', 1))
+        return aggregate_ip(ip, self.config.get('CLIENT_IPV4_PREFIX', 32), self.config.get('CLIENT_IPV6_PREFIX', 64))
+
+    async def read_body(self, receive):
+        """Read the request body, or None once it exceeds MAX_BODY_BYTES"""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def respond(self, send, scope, status, payload):
+        """Send a JSON response and return its body size"""
+        headers = [(b'vary', b'Origin')]
+        origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+        if origin in OFFICIAL_ORIGINS:
+            headers += [
+                (b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-methods', b'POST, OPTIONS'),
+                (b'access-control-allow-headers', b'Content-Type, Authorization, Accept, Cache-Control'),
+                (b'access-control-max-age', b'86400'),
+            ]
+        body = b''
+        if payload is not None:
+            body = dumps_bytes(payload, orjson.OPT_APPEND_NEWLINE)
+            headers.append((b'content-type', b'application/json'))
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        return len(body)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.client is not None:
+                    await self.client.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def create_asgi_app(config=None):
+    """Ingestion app in front of the Flask app, which serves every other endpoint"""
+    flask_app = create_app(config)
+    return IngestApp(flask_app, fallback=WsgiToAsgi(flask_app))
+
+app = create_asgi_app()
@@ -0,0 +1,348 @@
+"""
+Latency, throughput and memory of the main API routes, written to JSON
+
+Seeds the students and messages collections with synthetic data, then
+drives /api/register, /api/contact, /api/students, /api/messages and
+/api/export/students through the Flask test client (in-process, no network)
+and through a real gunicorn server (gunicorn.conf.py, over HTTP):
+
+    MONGODB_URI=mongodb://localhost:27017/camp_bench \
+        python benchmarks/api.py --students 20000 --messages 5000 --output before.json
+    ... change the code ...
+    MONGODB_URI=mongodb://localhost:27017/camp_bench \
+        python benchmarks/api.py --students 20000 --messages 5000 --output after.json --compare before.json
+
+Without MONGODB_URI the test client runs on mongomock (pip install mongomock)
+and the gunicorn part is skipped, since a separate process cannot share it.
+--compare prints the change of every route against a previous run and exits
+with status 1 when a p95 grew by more than --tolerance.
+
+Every run drops and refills the students, messages and duplicates
+collections; point MONGODB_URI at a disposable database.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Backend modules first: benchmarks/search.py would shadow search.py otherwise
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+sys.path.insert(0, BACKEND_DIR)
+
+from load_register import percentile
+
+PRENOMS = ['Aïcha', 'Hélène', 'Jean', 'Koffi', 'Mariam', 'Rodrigue', 'Fifamè', 'Sènami', 'Ulrich', 'Grâce']
+NOMS = ['Houngbédji', 'Adjovi', 'Agossou', 'Dossou', 'Zinsou', 'Gbaguidi', 'Soglo', 'Kouton', 'Tossou', 'Bello']
+NIVEAUX = ['seconde', 'premiere', 'terminale']
+DEPARTEMENTS = ['Littoral', 'Atlantique', 'Ouémé', 'Borgou', 'Zou', 'Mono']
+INTERESTS = ['participant', 'parent', 'intervenant', 'partenaire']
+MOTIVATION = 'Je veux progresser en mathématiques et préparer les olympiades avec d’autres passionnés. '
+
+# Route -> request built from a sequence number. The `_` parameter makes every
+# list URL distinct, so the per-worker response cache and ETags do not answer
+# in place of the database; the `_cached` variants repeat one URL on purpose.
+SCENARIOS = {
+    'students': lambda i: ('GET', f'/api/students?limit=50&_={i}', None),
+    'students_cached': lambda i: ('GET', '/api/students?limit=50', None),
+    'messages': lambda i: ('GET', f'/api/messages?limit=50&_={i}', None),
+    'export_csv': lambda i: ('GET', f'/api/export/students?format=csv&_={i}', None),
+    'register': lambda i: ('POST', '/api/register', student_payload(random.Random(i), f'bench-{i}-{time.time_ns()}')),
+    'contact': lambda i: ('POST', '/api/contact', contact_payload(random.Random(i))),
+}
+# Reads first, so they all see exactly the seeded volume
+SCENARIO_ORDER = ['students', 'students_cached', 'messages', 'export_csv', 'register', 'contact']
+
+def student_payload(rng, tag):
+    return {
+        'prenom': rng.choice(PRENOMS), 'nom': rng.choice(NOMS), 'email': f'{tag}@example.bj',
+        'telephone': f'+229 {rng.randrange(10**7, 10**8)}', 'age': rng.randint(14, 18),
+        'niveau': rng.choice(NIVEAUX), 'ecole': 'Lycée Béhanzin', 'ville': 'Cotonou',
+        'departement': rng.choice(DEPARTEMENTS), 'commune': 'Cotonou', 'motivation': MOTIVATION,
+    }
+
+def contact_payload(rng):
+    return {
+        'name': f'{rng.choice(PRENOMS)} {rng.choice(NOMS)}', 'email': f'contact{rng.randrange(10**6)}@example.bj',
+        'interest': rng.choice(INTERESTS), 'message': 'Bonjour, je voudrais des informations sur le camp.',
+    }
+
+def seed(db, students, messages, edition, seed=7):
+    """Refill the collections with documents shaped exactly like the ones the API inserts"""
+    from submissions import new_contact_doc, new_student_doc
+    from input_validator import CONTACT_SCHEMA, STUDENT_SCHEMA
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=60)
+    for name in ('students', 'messages', 'duplicates'):
+        db[name].delete_many({})
+    batch = []
+    for i in range(students):
+        doc = new_student_doc(STUDENT_SCHEMA.validate(student_payload(rng, f'seed{i}'))[0], edition)
+        doc['registeredAt'] = start + timedelta(seconds=i * 60 * 60 * 24 * 60 / max(students, 1))
+        doc['status'] = rng.choice(['pending', 'pending', 'confirmed', 'rejected'])
+        doc['dedupCheckedAt'] = doc['registeredAt']
+        batch.append(doc)
+        if len(batch) == 1000:
+            db.students.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.students.insert_many(batch, ordered=False)
+    docs = []
+    for i in range(messages):
+        doc = new_contact_doc(CONTACT_SCHEMA.validate(contact_payload(rng))[0], edition)
+        doc['createdAt'] = start + timedelta(seconds=i * 60 * 60 * 24 * 60 / max(messages, 1))
+        docs.append(doc)
+    if docs:
+        db.messages.insert_many(docs, ordered=False)
+
+class TestClientTarget:
+    """Requests through the Flask test client, one client per thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def send(self, method, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        size = sum(len(chunk) for chunk in response.response) if response.is_streamed else len(response.data)
+        response.close()
+        return response.status_code, size
+
+    def peak_rss_mb(self):
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class HttpTarget:
+    """Requests over keep-alive HTTP connections, one connection per thread"""
+
+    def __init__(self, host, port, server_pid):
+        self.host = host
+        self.port = port
+        self.server_pid = server_pid
+        self.local = threading.local()
+
+    def send(self, method, path, body):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        data = json.dumps(body).encode() if body is not None else None
+        for attempt in range(2):
+            connection = getattr(self.local, 'connection', None)
+            if connection is None:
+                connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                return response.status, len(response.read())
+            except (http.client.HTTPException, OSError):
+                # Closed by the server (keepalive timeout, worker recycled): reconnect once
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    return 0, 0
+
+    def peak_rss_mb(self):
+        """Largest peak resident size among the gunicorn processes (Linux only)"""
+        pids = [self.server_pid]
+        try:
+            with open(f'/proc/{self.server_pid}/task/{self.server_pid}/children') as f:
+                pids += [int(pid) for pid in f.read().split()]
+        except OSError:
+            return None
+        peaks = []
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    peaks += [int(line.split()[1]) for line in f if line.startswith('VmHWM:')]
+            except OSError:
+                continue
+        return round(max(peaks) / 1024, 1) if peaks else None
+
+def run_scenario(target, build, total, concurrency):
+    latencies, statuses = [], {}
+    transferred = [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            method, path, body = build(i)
+            began = time.perf_counter()
+            status, size = target.send(method, path, body)
+            elapsed = time.perf_counter() - began
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                transferred[0] += size
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - began
+    latencies.sort()
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'requests_per_s': round(total / duration, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'mean_kb': round(transferred[0] / total / 1024, 1),
+        'statuses': statuses,
+        'peak_rss_mb': target.peak_rss_mb(),
+    }
+
+def run_all(target, args):
+    results = {}
+    for name in args.scenarios:
+        total = args.export_requests if name.startswith('export') else args.requests
+        # Warm up connection pools, the trigram caches and the worker imports first
+        run_scenario(target, SCENARIOS[name], min(10, total), 1)
+        results[name] = run_scenario(target, SCENARIOS[name], total, args.concurrency)
+        print(f"{target.__class__.__name__:<16} {name:<16} {json.dumps({k: v for k, v in results[name].items() if k != 'statuses'})}",
+              file=sys.stderr)
+    return results
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/api/health/live', timeout=1):
+                return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f'{base_url} did not start')
+
+def run_gunicorn(args):
+    env = dict(os.environ, RATE_LIMIT_REGISTER='1000000000', RATE_LIMIT_CONTACT='1000000000',
+               WEB_CONCURRENCY=str(args.workers))
+    command = ['gunicorn', 'app:app', '--bind', f'127.0.0.1:{args.port}', '--access-logfile', '/dev/null']
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    try:
+        wait_until_up(f'http://127.0.0.1:{args.port}')
+        return run_all(HttpTarget('127.0.0.1', args.port, server.pid), args)
+    finally:
+        server.terminate()
+        server.wait()
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous, current, tolerance):
+    """Print the change of every route against a previous run; return the regressed ones"""
+    regressions = []
+    for mode, routes in current['results'].items():
+        for name, now in routes.items():
+            before = previous.get('results', {}).get(mode, {}).get(name)
+            if not isinstance(before, dict) or 'p95_ms' not in before or 'p95_ms' not in now:
+                continue
+            p95 = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+            rps = (now['requests_per_s'] - before['requests_per_s']) / before['requests_per_s'] if before['requests_per_s'] else 0.0
+            flag = ' REGRESSION' if p95 > tolerance else ''
+            print(f'{mode:<12} {name:<16} p95 {before["p95_ms"]:>9} -> {now["p95_ms"]:>9} ms ({p95:+.0%})  '
+                  f'throughput {rps:+.0%}{flag}', file=sys.stderr)
+            if flag:
+                regressions.append(f'{mode}/{name}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=300, help='requests per route')
+    parser.add_argument('--export-requests', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--modes', default='client,gunicorn', help='comma-separated: client,gunicorn')
+    parser.add_argument('--scenarios', default=','.join(SCENARIO_ORDER))
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--port', type=int, default=5078)
+    parser.add_argument('--output', help='JSON file to write, stdout otherwise')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative p95 growth')
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+    modes = args.modes.split(',')
+
+    # Read by create_app() at import of app.py: the benchmark client would be rate limited otherwise
+    os.environ['RATE_LIMIT_REGISTER'] = os.environ['RATE_LIMIT_CONTACT'] = '1000000000'
+    backend = 'mongodb'
+    if not os.environ.get('MONGODB_URI'):
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit('Set MONGODB_URI to a disposable database, or install mongomock')
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+        os.environ['MONGODB_URI'] = 'mongodb://localhost:27017/camp_bench'
+        os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+        backend = 'mongomock'
+
+    import logging
+    logging.disable(logging.INFO)
+    from app import app
+    from archive import current_edition
+    from indexes import ensure_indexes
+    mongo = app.extensions['mongo']
+    ensure_indexes(mongo.db)
+
+    report = {
+        'meta': {
+            'commit': git_commit(), 'date': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(), 'platform': platform.platform(), 'backend': backend,
+            'students': args.students, 'messages': args.messages, 'requests': args.requests,
+            'export_requests': args.export_requests, 'concurrency': args.concurrency, 'workers': args.workers,
+        },
+        'results': {},
+    }
+    for mode in modes:
+        if mode == 'gunicorn' and backend == 'mongomock':
+            report['results'][mode] = {'skipped': 'needs MONGODB_URI'}
+            continue
+        # Same starting data for every mode, whatever the previous one inserted
+        seed(mongo.db, args.students, args.messages, current_edition(app.config['CAMP_EDITION']))
+        if mode == 'client':
+            report['results'][mode] = run_all(TestClientTarget(app), args)
+        elif mode == 'gunicorn':
+            report['results'][mode] = run_gunicorn(args)
+        else:
+            parser.error(f'unknown mode: {mode}')
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            sys.exit(f'p95 regressions: {", ".join(regressions)}')
+
+if __name__ == '__main__':
+    main()
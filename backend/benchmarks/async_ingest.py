@@ -0,0 +1,68 @@
+"""
+Compare the sync Flask path with the ASGI ingestion path on POST /api/register
+
+Starts `gunicorn app:app` (gunicorn.conf.py) and `uvicorn asgi_ingest:app`
+one after the other on the same database, and drives each with the same
+number of concurrent clients through benchmarks/load_register.py:
+
+    MONGODB_URI=mongodb://localhost:27017/camp_bench \
+        python benchmarks/async_ingest.py --requests 3000 --concurrency 200
+
+Every run inserts real documents; point MONGODB_URI at a disposable database.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+from load_register import run
+
+SERVERS = {
+    'sync (gunicorn gthread)': ['gunicorn', 'app:app', '--workers', '1'],
+    'async (uvicorn asgi_ingest)': ['uvicorn', 'asgi_ingest:app', '--workers', '1', '--log-level', 'warning'],
+}
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/api/health/live', timeout=1):
+                return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f'{base_url} did not start')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--port', type=int, default=5077)
+    args = parser.parse_args()
+    if not os.environ.get('MONGODB_URI'):
+        sys.exit('MONGODB_URI must point at a disposable database')
+
+    env = dict(os.environ, PORT=str(args.port), RATE_LIMIT_REGISTER='1000000000')
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = {}
+    for name, command in SERVERS.items():
+        if command[0] == 'uvicorn':
+            command = command + ['--port', str(args.port)]
+        server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+        try:
+            wait_until_up(base_url)
+            # Warm up the connection pools before measuring
+            run(base_url, 50, 10)
+            results[name] = run(base_url, args.requests, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
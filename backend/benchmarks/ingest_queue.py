@@ -0,0 +1,92 @@
+"""
+Measure the write-behind ingestion journal (ingest_queue.py)
+
+Enqueues documents from concurrent threads into a fresh SQLite journal, the
+cost a buffered POST /api/register pays before answering 202:
+
+    python benchmarks/ingest_queue.py --documents 20000 --threads 16
+
+With MONGODB_URI set, the journal is then drained into that database with
+group commits of --batch-size documents and the drain rate is reported too.
+Every drain inserts real documents; point MONGODB_URI at a disposable database.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest_queue import IngestQueue
+
+def sample_doc():
+    return {
+        '_id': ObjectId(),
+        'prenom': 'Awa', 'nom': 'Ngono',
+        'email': f'{uuid.uuid4().hex}@bench.example',
+        'telephone': '+237 690 00 00 00',
+        'niveau': 'Terminale', 'etablissement': 'Lycée de Bonabéri',
+        'motivation': 'Benchmark ' * 20,
+        'status': 'pending',
+        'registeredAt': datetime.utcnow(),
+    }
+
+def enqueue_rate(queue, documents, threads):
+    per_thread = documents // threads
+    start = threading.Barrier(threads + 1)
+
+    def worker():
+        docs = [sample_doc() for _ in range(per_thread)]
+        start.wait()
+        for doc in docs:
+            queue.enqueue('students', doc)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    start.wait()
+    began = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - began
+    return {'documents': per_thread * threads, 'seconds': round(elapsed, 3),
+            'per_second': round(per_thread * threads / elapsed)}
+
+def drain_rate(queue):
+    total = queue.pending()
+    began = time.perf_counter()
+    while queue.flush():
+        pass
+    elapsed = time.perf_counter() - began
+    return {'documents': total, 'seconds': round(elapsed, 3), 'per_second': round(total / elapsed) if elapsed else None}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    get_collection = None
+    if os.environ.get('MONGODB_URI'):
+        from pymongo import MongoClient
+        db = MongoClient(os.environ['MONGODB_URI']).get_default_database()
+        get_collection = lambda name: db[name]
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The flusher thread is never started: enqueue() is measured alone, then drained explicitly
+        queue = IngestQueue(os.path.join(directory, 'journal.sqlite3'), get_collection, batch_size=args.batch_size)
+        queue.start = lambda: None
+        results = {'enqueue': enqueue_rate(queue, args.documents, args.threads)}
+        if get_collection is not None:
+            results['drain'] = drain_rate(queue)
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Load test for POST /api/register against a running server
+
+Sends unique registrations from concurrent client threads and reports the
+throughput and latency percentiles, e.g. to compare the Flask dev server
+with the gunicorn configuration:
+
+    python app.py                      # dev server on :5000
+    gunicorn app:app                   # gunicorn.conf.py on :5000
+    python benchmarks/load_register.py http://localhost:5000 --requests 2000 --concurrency 32
+
+Set RATE_LIMIT_REGISTER high enough on the server, otherwise most requests get a 429.
+Every run inserts real documents; point it at a disposable database.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+def payload():
+    return {
+        'prenom': 'Charge', 'nom': 'Test', 'email': f'load-{uuid.uuid4().hex}@example.com',
+        'telephone': '+229 97000000', 'age': 16, 'niveau': 'seconde', 'ecole': 'Lycée Test',
+        'ville': 'Cotonou', 'departement': 'Littoral', 'commune': 'Cotonou',
+        'motivation': 'Inscription générée par le test de charge du backend. ' * 2,
+    }
+
+def post(url, body):
+    req = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                 headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(req, timeout=30) as res:
+            res.read()
+            return res.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return 0
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+def run(base_url, total, concurrency):
+    url = base_url.rstrip('/') + '/api/register'
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            body = payload()
+            start = time.perf_counter()
+            status = post(url, body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'duration_s': round(duration, 3),
+        'requests_per_s': round(total / duration, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        'statuses': statuses,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('base_url')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+    print(json.dumps(run(args.base_url, args.requests, args.concurrency), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Latency of /api/search building blocks at 10k and 100k applicants
+
+Measures the in-process trigram name index (build time and fuzzy query
+latency) on synthetic names. With MONGODB_URI set, the same documents are
+also inserted into that database and the French $text query is timed:
+
+    python benchmarks/search.py
+    MONGODB_URI=mongodb://localhost:27017/camp_bench python benchmarks/search.py
+
+The Mongo part drops and refills the `students` collection; point
+MONGODB_URI at a disposable database.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes import STUDENT_INDEXES
+from search import TrigramIndex
+
+PRENOMS = ['Aïcha', 'Hélène', 'Jean', 'Koffi', 'Mariam', 'Rodrigue', 'Fifamè', 'Sènami', 'Ulrich',
+           'Grâce', 'Espérance', 'Nadège', 'Romaric', 'Chabi', 'Bio', 'Fatoumata', 'Gildas', 'Prisca']
+NOMS = ['Houngbédji', 'Adjovi', 'Agossou', 'Dossou', 'Zinsou', 'Gbaguidi', 'Ahouandjinou', 'Soglo',
+        'Kouton', 'Tossou', 'Yessoufou', 'Sanni', 'Akplogan', 'Hounkpatin', 'Bello', 'Quenum']
+ECOLES = ['CEG Le Nokoué', 'Lycée Béhanzin', 'CEG Gbégamey', 'Collège Père Aupiais', 'Lycée Mathieu Bouké']
+WORDS = ('mathématiques algèbre géométrie olympiades passion problèmes apprendre camp '
+         'ingénieur informatique statistiques découvrir progresser concours').split()
+QUERIES = ['helene adjovi', 'Houngbedji', 'aicha agossu', 'rodrige', 'sènami zinsou', 'grace']
+TEXT_QUERIES = ['olympiades', 'géométrie passion', 'Béhanzin', 'informatique concours']
+
+def make_docs(n, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [{
+        'prenom': rng.choice(PRENOMS), 'nom': rng.choice(NOMS) + ('' if rng.random() < 0.7 else str(i % 97)),
+        'email': f'bench{i}@example.bj', 'ecole': rng.choice(ECOLES), 'ville': 'Cotonou', 'commune': 'Cotonou',
+        'motivation': ' '.join(rng.choice(WORDS) for _ in range(40)),
+        'status': 'pending', 'registeredAt': start + timedelta(seconds=i),
+    } for i in range(n)]
+
+def percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+    return {'p50_ms': round(statistics.median(ordered), 3),
+            'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1], 3)}
+
+def trigram_bench(docs, repeat=50):
+    index = TrigramIndex(None, ['prenom', 'nom'], 'registeredAt')
+    began = time.perf_counter()
+    for i, doc in enumerate(docs):
+        TrigramIndex._add(index.state, i, f"{doc['prenom']} {doc['nom']}")
+    build = time.perf_counter() - began
+    samples = []
+    for _ in range(repeat):
+        for q in QUERIES:
+            t = time.perf_counter()
+            index.search(q, limit=20)
+            samples.append((time.perf_counter() - t) * 1000)
+    return {'build_s': round(build, 3), 'trigrams': len(index.state[2]), **percentiles(samples)}
+
+def text_bench(db, docs, repeat=20):
+    db.students.drop()
+    db.students.insert_many(docs, ordered=False)
+    for keys, options in STUDENT_INDEXES:
+        if options.get('name') == 'students_text':
+            db.students.create_index(keys, **options)
+    samples = []
+    for _ in range(repeat):
+        for q in TEXT_QUERIES:
+            t = time.perf_counter()
+            list(db.students.find({'$text': {'$search': q}}, {'score': {'$meta': 'textScore'}})
+                 .sort([('score', {'$meta': 'textScore'})]).limit(20))
+            samples.append((time.perf_counter() - t) * 1000)
+    return percentiles(samples)
+
+def main():
+    db = None
+    if os.environ.get('MONGODB_URI'):
+        from pymongo import MongoClient
+        db = MongoClient(os.environ['MONGODB_URI']).get_default_database()
+    print(f"{'documents':>10}  {'part':<8} results")
+    for n in (10_000, 100_000):
+        docs = make_docs(n)
+        print(f'{n:>10}  {"trigram":<8} {trigram_bench(docs)}')
+        if db is not None:
+            print(f'{n:>10}  {"$text":<8} {text_bench(db, docs)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+CPU time and allocations of the list endpoints' serialization, before and after orjson
+
+Compares, for a page of 500 students and a full list of 10k:
+
+- stdlib: stored documents reshaped by serialize_student (isoformat per
+  timestamp) and encoded by Flask's default JSON provider
+- orjson: documents already shaped by the $project stage, encoded by the
+  orjson provider, as one JSON array or streamed as NDJSON
+
+Encoding is timed alone, then with the BSON decoding the driver pays for
+every field the server returns, internal ones like dedupKeys included.
+Peak traced memory shows the allocations held at once:
+
+    python benchmarks/serialization.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from duplicates import blocking_keys
+from input_validator import normalize_phone
+from json_provider import dumps_bytes, ndjson_stream
+
+STUDENT_FIELDS = ['prenom', 'nom', 'email', 'telephone', 'age', 'niveau', 'ecole', 'ville',
+                  'departement', 'commune', 'motivation', 'registeredAt', 'status']
+PRENOMS = ['Aïcha', 'Hélène', 'Jean', 'Koffi', 'Mariam', 'Rodrigue', 'Fifamè', 'Sènami']
+NOMS = ['Houngbédji', 'Adjovi', 'Agossou', 'Dossou', 'Zinsou', 'Gbaguidi', 'Soglo', 'Kouton']
+
+def stored_docs(n, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2025, 3, 1)
+    docs = []
+    for i in range(n):
+        doc = {
+            '_id': ObjectId(), 'prenom': rng.choice(PRENOMS), 'nom': rng.choice(NOMS),
+            'email': f'eleve{i}@example.bj', 'telephone': f'+229 {rng.randrange(10**7, 10**8)}',
+            'age': rng.randint(14, 18), 'niveau': 'seconde', 'ecole': 'Lycée Béhanzin', 'ville': 'Cotonou',
+            'departement': 'Littoral', 'commune': 'Cotonou', 'motivation': 'Passionné de mathématiques. ' * 8,
+            'registeredAt': start + timedelta(seconds=i, milliseconds=rng.randrange(1000)), 'status': 'pending',
+        }
+        doc['telephoneNormalized'] = normalize_phone(doc['telephone'])
+        doc['dedupKeys'] = blocking_keys(doc)
+        doc['dedupCheckedAt'] = doc['registeredAt']
+        docs.append(doc)
+    return docs
+
+def shaped_docs(docs):
+    """What the api_shape $project stage returns for the same documents"""
+    return [{'id': d['_id'], **{f: d.get(f) for f in STUDENT_FIELDS}} for d in docs]
+
+def serialize_student(s, fields=None):
+    # GET /api/students before the $project stage
+    out = {'id': str(s['_id'])}
+    for f in fields or STUDENT_FIELDS:
+        value = s.get(f)
+        out[f] = value.isoformat() if isinstance(value, datetime) else value
+    return out
+
+def measure(fn, repeat):
+    fn()
+    began = time.process_time()
+    for _ in range(repeat):
+        fn()
+    cpu_ms = (time.process_time() - began) / repeat * 1000
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak / 1024
+
+def main():
+    stdlib = DefaultJSONProvider(Flask(__name__))
+    print(f"{'case':<34} {'stdlib ms':>10} {'orjson ms':>10} {'speedup':>8} {'stdlib KiB':>11} {'orjson KiB':>11}")
+    for label, n, repeat in (('500', 500, 50), ('10k', 10_000, 5)):
+        docs = stored_docs(n)
+        # One BSON document after the other, as in the driver's reply batches
+        stored = b''.join(bson.encode(d) for d in docs)
+        shaped = b''.join(bson.encode(d) for d in shaped_docs(docs))
+        stored_list, shaped_list = bson.decode_all(stored), bson.decode_all(shaped)
+        before = lambda: stdlib.dumps([serialize_student(s) for s in bson.decode_iter(stored)])
+        cases = {
+            'encode only': (lambda: stdlib.dumps([serialize_student(s) for s in stored_list]),
+                            lambda: dumps_bytes(shaped_list)),
+            'decode + encode, json': (before, lambda: dumps_bytes(bson.decode_all(shaped))),
+            'decode + encode, ndjson': (before, lambda: sum(map(len, ndjson_stream(bson.decode_iter(shaped))))),
+        }
+        for name, (slow, fast) in cases.items():
+            slow_ms, slow_kib = measure(slow, repeat)
+            fast_ms, fast_kib = measure(fast, repeat)
+            print(f'{label + " " + name:<34} {slow_ms:>10.2f} {fast_ms:>10.2f} {slow_ms / fast_ms:>7.1f}x '
+                  f'{slow_kib:>11.0f} {fast_kib:>11.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of per-payload validation cost
+
+Compares the schema engine in input_validator.py with the previous ad-hoc
+implementation (string patterns passed to re.match and an re.sub sanitizer).
+
+Usage:
+    python benchmarks/validation.py [iterations]
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input_validator import STUDENT_SCHEMA, CONTACT_SCHEMA
+
+STUDENT = {
+    'prenom': 'Aïcha', 'nom': 'Houngbédji', 'email': ' Aicha.H@example.bj ',
+    'telephone': '+229 97123456', 'age': '16', 'niveau': 'seconde',
+    'ecole': 'CEG Le Nokoué', 'ville': 'Cotonou', 'departement': 'Littoral',
+    'commune': 'Cotonou', 'motivation': "J'aime les mathématiques et je veux progresser. " * 8,
+}
+CONTACT = {
+    'name': 'Parent <Test>', 'email': 'parent@example.com', 'phone': '12345678',
+    'interest': 'parent', 'message': 'Bonjour, je souhaite avoir plus d\'informations.',
+}
+
+def legacy_sanitize(text, max_length=1000):
+    if not isinstance(text, str):
+        return ''
+    return re.sub(r"[<>\"'\x00-\x1f\x7f-\x9f]", '', text).strip()[:max_length]
+
+def legacy_email(email):
+    return bool(email and re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[A-Za-z]{2,}$', email.strip()))
+
+def legacy_phone(phone):
+    if not phone:
+        return True
+    phone = phone.strip()
+    return any(re.match(p, phone) for p in (r'^\+229\s?[0-9]{8}$', r'^[0-9]{8}$', r'^\+?[0-9]{8,15}$'))
+
+def legacy_student(data):
+    required = ['prenom','nom','email','telephone','age','niveau','ecole','ville','departement','commune','motivation']
+    if [f for f in required if not data.get(f) or (isinstance(data.get(f), str) and not data[f].strip())]:
+        return None
+    telephone = legacy_sanitize(data['telephone'], 20)
+    age = int(data['age'])
+    email = data['email'].strip().lower()
+    if not (14 <= age <= 18 and legacy_email(email) and legacy_phone(telephone)):
+        return None
+    if data['niveau'].strip() not in ['quatrieme','troisieme','seconde','premiere','terminale']:
+        return None
+    return {
+        'prenom': legacy_sanitize(data['prenom'], 100), 'nom': legacy_sanitize(data['nom'], 100),
+        'email': email, 'telephone': telephone, 'age': age, 'niveau': data['niveau'].strip(),
+        'ecole': legacy_sanitize(data['ecole'], 200), 'ville': legacy_sanitize(data['ville'], 100),
+        'departement': legacy_sanitize(data['departement'], 100), 'commune': legacy_sanitize(data['commune'], 100),
+        'motivation': legacy_sanitize(data['motivation'], 2000),
+    }
+
+def legacy_contact(data):
+    email = data['email'].strip().lower()
+    phone = legacy_sanitize(data.get('phone', ''), 20)
+    if not legacy_email(email) or (phone and not legacy_phone(phone)):
+        return None
+    if data['interest'].strip() not in ['participant','parent','intervenant','partenaire']:
+        return None
+    return {'name': legacy_sanitize(data['name'], 100), 'email': email, 'phone': phone,
+            'interest': data['interest'].strip(), 'message': legacy_sanitize(data['message'], 2000)}
+
+def per_call_us(fn, payload, iterations):
+    return min(timeit.repeat(lambda: fn(payload), number=iterations, repeat=5)) / iterations * 1e6
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rows = [
+        ('student', 'legacy', per_call_us(legacy_student, STUDENT, iterations)),
+        ('student', 'schema', per_call_us(STUDENT_SCHEMA.validate, STUDENT, iterations)),
+        ('contact', 'legacy', per_call_us(legacy_contact, CONTACT, iterations)),
+        ('contact', 'schema', per_call_us(CONTACT_SCHEMA.validate, CONTACT, iterations)),
+    ]
+    print(f'{"payload":<10}{"validator":<12}{"us/payload":>12}')
+    for payload, name, cost in rows:
+        print(f'{payload:<10}{name:<12}{cost:>12.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import csv
+import json
+import logging
+import shutil
+import tempfile
+from pymongo.errors import BulkWriteError
+from export import EXPORT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'xlsx', 'ndjson')
+IMPORT_BATCH_SIZE = 500
+# Rejected rows listed in the summary; the counts go on past it
+MAX_REJECTED_ROWS = 1000
+
+# Export headers ('Prénom', 'Téléphone', ...) are accepted next to the API field names
+HEADER_ALIASES = {header.lower(): field for header, field in EXPORT_COLUMNS if field != '_id'}
+
+CONTENT_TYPE_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+
+class ImportFormatError(ValueError):
+    """Raised when an uploaded file cannot be read"""
+
+class UnreadableLineError(ValueError):
+    """Raised when a line of an uploaded file is not valid UTF-8, or a row of a sheet cannot be read"""
+    def __init__(self, line, reason):
+        super().__init__(f'Line {line}: {reason}')
+        self.line = line
+
+def detect_format(filename=None, content_type=None, explicit=None):
+    """Resolve the upload format from an explicit parameter, the file extension or the content type"""
+    if explicit:
+        if explicit not in IMPORT_FORMATS:
+            raise ImportFormatError("Format d'import invalide")
+        return explicit
+    if filename and '.' in filename:
+        ext = filename.rsplit('.', 1)[-1].lower()
+        if ext in ('jsonl', 'json'):
+            ext = 'ndjson'
+        if ext in IMPORT_FORMATS:
+            return ext
+    if content_type:
+        fmt = CONTENT_TYPE_FORMATS.get(content_type.split(';')[0].strip())
+        if fmt:
+            return fmt
+    raise ImportFormatError("Format d'import non reconnu (csv, xlsx ou ndjson)")
+
+def _normalize_key(key):
+    key = str(key).strip() if key is not None else ''
+    return HEADER_ALIASES.get(key.lower(), key)
+
+def _cell(value):
+    """Spreadsheet cells come back typed; the schema expects JSON-like values"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+def _decoded_lines(stream):
+    """UTF-8 lines of a binary stream, decoded one by one so a bad byte is reported on its own line"""
+    for number, raw in enumerate(stream, start=1):
+        try:
+            yield raw.decode('utf-8-sig' if number == 1 else 'utf-8')
+        except UnicodeDecodeError as e:
+            raise UnreadableLineError(number, e.reason)
+
+def _sheet_rows(rows):
+    """Numbered rows of a read-only sheet; a corrupt part of the archive is reported as the row it stops at"""
+    number = 0
+    while True:
+        number += 1
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except Exception as e:
+            # openpyxl surfaces zip, zlib and XML errors alike while streaming the sheet
+            raise UnreadableLineError(number, str(e))
+        yield number, row
+
+def iter_records(stream, fmt):
+    """
+    Lazily yield (row number, record) pairs from an uploaded file
+
+    CSV and NDJSON are decoded line by line from the stream; XLSX is read with
+    a read-only workbook, so no format loads the whole sheet in memory.
+    """
+    if fmt == 'csv':
+        reader = csv.reader(_decoded_lines(stream))
+        header = [_normalize_key(k) for k in next(reader, [])]
+        for number, row in enumerate(reader, start=2):
+            if any(cell.strip() for cell in row):
+                yield number, dict(zip(header, row))
+    elif fmt == 'ndjson':
+        for number, line in enumerate(_decoded_lines(stream), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, {_normalize_key(k): v for k, v in record.items()} if isinstance(record, dict) else None
+    elif fmt == 'xlsx':
+        from openpyxl import load_workbook
+        if not (hasattr(stream, 'seekable') and stream.seekable()):
+            # XLSX is a zip archive and needs random access; spool raw bodies to disk
+            spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+            shutil.copyfileobj(stream, spooled)
+            spooled.seek(0)
+            stream = spooled
+        try:
+            wb = load_workbook(stream, read_only=True, data_only=True)
+        except Exception:
+            raise ImportFormatError('Fichier XLSX illisible')
+        try:
+            rows = _sheet_rows(wb.active.iter_rows(values_only=True))
+            header = [_normalize_key(k) for k in next(rows, (1, ()))[1]]
+            for number, row in rows:
+                if any(cell is not None and str(cell).strip() for cell in row):
+                    yield number, {k: _cell(v) for k, v in zip(header, row)}
+        finally:
+            wb.close()
+
+def _reject(summary, entry):
+    if len(summary['rejected']) < MAX_REJECTED_ROWS:
+        summary['rejected'].append(entry)
+    else:
+        summary['rejectedTruncated'] = True
+
+def _flush(collection, batch, summary):
+    """Insert one batch unordered; duplicate emails are reported, not fatal"""
+    docs = [doc for _, doc in batch]
+    try:
+        collection.insert_many(docs, ordered=False)
+        summary['inserted'] += len(docs)
+    except BulkWriteError as bwe:
+        summary['inserted'] += bwe.details.get('nInserted', 0)
+        for err in bwe.details.get('writeErrors', []):
+            number = batch[err['index']][0]
+            if err.get('code') == 11000:
+                summary['duplicates'] += 1
+                _reject(summary, {'row': number, 'status': 'duplicate',
+                                  'error': 'Cette adresse email est déjà utilisée'})
+            else:
+                logger.error(f'Bulk insert error on row {number}: {err.get("errmsg")}')
+                summary['failed'] += 1
+                _reject(summary, {'row': number, 'status': 'failed',
+                                  'error': 'Erreur lors de la sauvegarde'})
+    batch.clear()
+
+def import_students(collection, records, schema, prepare, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Validate records with the registration schema and insert them in batches
+
+    A file that cannot be decoded past some row does not undo the batches
+    already inserted: the rows read before it are still imported, and the
+    summary gets `errorRow`, the first row that could not be read.
+
+    Args:
+        collection: Students collection
+        records: Iterable of (row number, record) pairs from iter_records
+        schema: Validation schema shared with /api/register
+        prepare: Callable turning a validated record into the stored document
+        batch_size: Number of documents per insert_many call
+
+    Returns:
+        dict: Counts per outcome and the first MAX_REJECTED_ROWS rejected
+            rows (`rejectedTruncated` when there were more)
+    """
+    summary = {'rows': 0, 'inserted': 0, 'invalid': 0, 'duplicates': 0, 'failed': 0, 'rejected': []}
+    batch = []
+    number = 1
+    try:
+        for number, record in records:
+            summary['rows'] += 1
+            doc, errors = schema.validate(record)
+            if errors:
+                summary['invalid'] += 1
+                _reject(summary, {'row': number, 'status': 'invalid', 'errors': errors})
+                continue
+            batch.append((number, prepare(doc)))
+            if len(batch) >= batch_size:
+                _flush(collection, batch, summary)
+    except (UnreadableLineError, csv.Error) as e:
+        logger.error(f'Bulk import read error after row {number}: {e}')
+        summary['errorRow'] = e.line if isinstance(e, UnreadableLineError) else number + 1
+    if batch:
+        _flush(collection, batch, summary)
+    return summary
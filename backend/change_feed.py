@@ -0,0 +1,271 @@
+import os
+import time
+import base64
+import logging
+import threading
+from collections import deque
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+# Collections in the feed and the timestamp set when a document is inserted
+FEED_COLLECTIONS = {'students': 'registeredAt', 'messages': 'createdAt'}
+
+# Server errors meaning change streams are not available on this deployment
+CHANGE_STREAM_UNSUPPORTED = (40573, 40324, 303, 20)
+# Error raised when a resume token is older than the oplog
+CHANGE_STREAM_HISTORY_LOST = (286, 280)
+
+class ChangeFeedError(ValueError):
+    """Raised for a resume token that cannot be decoded"""
+
+def encode_token(kind, value):
+    raw = json_util.dumps([kind, value]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_token(token):
+    """Return (kind, value) of a token produced by encode_token"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        kind, value = json_util.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ChangeFeedError('Jeton de reprise invalide')
+    if kind not in ('stream', 'poll'):
+        raise ChangeFeedError('Jeton de reprise invalide')
+    return kind, value
+
+class ChangeFeed:
+    def __init__(self, get_db, mode='auto', poll_interval=2.0, batch_size=200, history=1000):
+        """
+        Insert, update and delete events of the students and messages collections
+
+        Events come from a MongoDB change stream when the deployment has one
+        (replica set or Atlas). Otherwise a poller follows the insertion and
+        `statusUpdatedAt` timestamps; it cannot see which documents were
+        deleted, so it emits a `resync` event when the number of documents
+        behind its watermark changes. One poller runs per process, only while
+        connections follow it, and fans its events out to all of them.
+
+        Every event carries an opaque resume token; passing it back to
+        events() continues right after that event.
+
+        Args:
+            get_db: Callable returning the Mongo database
+            mode: 'auto', 'changestream' or 'poll'
+            poll_interval: Seconds between two polls of the fallback poller
+            batch_size: Maximum documents read per collection and poll
+            history: Poller events kept for connections resuming from a token
+        """
+        self.get_db = get_db
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.poller = SharedPoller(self, history)
+
+    def events(self, token=None, until=None):
+        """
+        Yield (token, event) pairs until the `until` monotonic deadline
+
+        event is None when nothing happened for a while, so the caller can
+        send a heartbeat. Events are dicts with `type` (insert, update,
+        delete or resync), `collection`, `id` and the raw `document`.
+        """
+        kind, value = decode_token(token) if token else (None, None)
+        if self.mode != 'poll' and kind != 'poll':
+            try:
+                yield from self._stream(value, until)
+                return
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_HISTORY_LOST:
+                    yield None, {'type': 'resync'}
+                    yield from self._stream(None, until)
+                    return
+                if self.mode == 'changestream' or e.code not in CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                # Remembered, so later connections go straight to the poller
+                logger.info(f'Change streams unavailable ({e.code}), polling instead')
+                self.mode = 'poll'
+        if kind == 'stream':
+            # A change stream token cannot be replayed by the poller
+            yield None, {'type': 'resync'}
+            token = None
+        yield from self._poll(token, until)
+
+    def _stream(self, resume_token, until):
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': list(FEED_COLLECTIONS)},
+            'operationType': {'$in': ['insert', 'update', 'replace', 'delete']},
+        }}]
+        with self.get_db().watch(pipeline, full_document='updateLookup', resume_after=resume_token,
+                                 max_await_time_ms=1000) as stream:
+            while until is None or time.monotonic() < until:
+                change = stream.try_next()
+                if change is None:
+                    yield None, None
+                    continue
+                document = change.get('fullDocument')
+                yield encode_token('stream', change['_id']), {
+                    'type': 'insert' if change['operationType'] == 'insert' else
+                            'delete' if change['operationType'] == 'delete' else 'update',
+                    'collection': change['ns']['coll'],
+                    'id': change['documentKey']['_id'],
+                    'document': document,
+                }
+
+    def _poll(self, token, until):
+        yield from self.poller.follow(token, until)
+
+    def _watermarks(self, collection, field):
+        latest = collection.find_one({field: {'$ne': None}}, {field: 1}, sort=[(field, -1), ('_id', -1)])
+        updated = collection.find_one({'statusUpdatedAt': {'$ne': None}}, {'statusUpdatedAt': 1},
+                                      sort=[('statusUpdatedAt', -1), ('_id', -1)])
+        created = [latest[field], latest['_id']] if latest else None
+        return {
+            'created': created,
+            'updated': [updated['statusUpdatedAt'], updated['_id']] if updated else None,
+            'count': self._count_until(collection, field, created),
+        }
+
+    def _poll_collection(self, collection, name, field, marks):
+        for doc in self._after(collection, field, marks['created']):
+            marks['created'] = [doc[field], doc['_id']]
+            marks['count'] += 1
+            yield {'type': 'insert', 'collection': name, 'id': doc['_id'], 'document': doc}
+        for doc in self._after(collection, 'statusUpdatedAt', marks['updated']):
+            marks['updated'] = [doc['statusUpdatedAt'], doc['_id']]
+            yield {'type': 'update', 'collection': name, 'id': doc['_id'], 'document': doc}
+
+        # Every document up to the insertion watermark has been sent; a different count means deletions
+        count = self._count_until(collection, field, marks['created'])
+        if count != marks['count']:
+            marks['count'] = count
+            yield {'type': 'resync', 'collection': name}
+
+    def _after(self, collection, field, mark):
+        """Documents strictly after a (timestamp, _id) watermark, oldest first"""
+        if mark is None:
+            query = {field: {'$ne': None}}
+        else:
+            query = {'$or': [{field: {'$gt': mark[0]}}, {field: mark[0], '_id': {'$gt': mark[1]}}]}
+        return collection.find(query).sort([(field, ASCENDING), ('_id', ASCENDING)]).limit(self.batch_size)
+
+    def _count_until(self, collection, field, mark):
+        """Number of documents up to and including a (timestamp, _id) watermark"""
+        if mark is None:
+            return 0
+        return collection.count_documents(
+            {'$or': [{field: {'$lt': mark[0]}}, {field: mark[0], '_id': {'$lte': mark[1]}}]}
+        )
+
+class SharedPoller:
+    def __init__(self, feed, history=1000):
+        """
+        One polling thread per process, shared by every connection of the feed
+
+        The thread polls only while at least one connection follows it, and
+        appends (sequence, token, event) entries to a bounded history that
+        followers read under a condition variable. A connection resuming
+        from a token still in the history continues right after it; any
+        other token (from another worker, or older than the history) gets a
+        `resync` event first.
+        """
+        self.feed = feed
+        self.entries = deque(maxlen=history)
+        self.next_seq = 0
+        self.followers = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.pid = None
+
+    def start(self):
+        """Start the polling thread in this process if it is not running"""
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.entries.clear()
+                self.thread = threading.Thread(target=self._run, name='change-feed-poller', daemon=True)
+                self.thread.start()
+
+    def follow(self, token, until):
+        """Yield (token, event) pairs like ChangeFeed.events(), from the shared history"""
+        self.start()
+        with self.condition:
+            self.followers += 1
+            self.condition.notify_all()
+        try:
+            position = None
+            while until is None or time.monotonic() < until:
+                with self.condition:
+                    if not self.entries:
+                        # The poller has not read its starting point yet
+                        self.condition.wait(1.0)
+                        if not self.entries:
+                            yield None, None
+                            continue
+                    if position is None:
+                        position, first = self._start(token)
+                    elif self.entries[0][0] > position:
+                        # Fell behind the history: some events are lost
+                        position, first = self.entries[-1][0] + 1, (self.entries[-1][1], {'type': 'resync'})
+                    else:
+                        first = None
+                    if first is None and self.next_seq <= position:
+                        self.condition.wait(1.0)
+                    batch = [(t, e) for seq, t, e in self.entries if seq >= position]
+                    position = self.next_seq
+                if first is not None:
+                    yield first
+                for entry in batch:
+                    yield entry
+                if not batch and first is None:
+                    yield None, None
+        finally:
+            with self.condition:
+                self.followers -= 1
+
+    def _start(self, token):
+        """First position to read and the entry to send before it"""
+        if token:
+            for seq, entry_token, _ in self.entries:
+                if entry_token == token:
+                    return seq + 1, None
+            return self.next_seq, (self.entries[-1][1], {'type': 'resync'})
+        # Hand out a starting point even when nothing changes
+        return self.next_seq, (self.entries[-1][1], None)
+
+    def _publish(self, token, event):
+        with self.condition:
+            self.entries.append((self.next_seq, token, event))
+            self.next_seq += 1
+            self.condition.notify_all()
+
+    def _run(self):
+        feed = self.feed
+        state = None
+        while True:
+            with self.condition:
+                while not self.followers:
+                    if state is not None:
+                        # Nobody listens: forget the history, resuming tokens will resync
+                        state = None
+                        self.entries.clear()
+                    self.condition.wait()
+            try:
+                db = feed.get_db()
+                if state is None:
+                    state = {name: feed._watermarks(db[name], field) for name, field in FEED_COLLECTIONS.items()}
+                    self._publish(encode_token('poll', state), None)
+                changed = False
+                for name, field in FEED_COLLECTIONS.items():
+                    for event in feed._poll_collection(db[name], name, field, state[name]):
+                        changed = True
+                        self._publish(encode_token('poll', state), event)
+                if not changed:
+                    time.sleep(feed.poll_interval)
+            except Exception as e:
+                logger.error(f'Change feed poll failed, will retry: {e}')
+                time.sleep(feed.poll_interval)
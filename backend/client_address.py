@@ -0,0 +1,65 @@
+import ipaddress
+from flask import g, request, current_app
+
+def resolve_client_ip(environ, trusted_hops=1):
+    """
+    Return the normalised client IP of a WSGI request
+
+    Like werkzeug's ProxyFix, only the last `trusted_hops` entries of
+    X-Forwarded-For are trusted: each proxy appends the address it received
+    the request from, so the entry `trusted_hops` from the end is the one
+    written by our outermost proxy. Anything to its left is client-supplied.
+
+    Args:
+        environ: WSGI environ of the request
+        trusted_hops: Number of reverse proxies in front of the app (0 ignores the header)
+    """
+    candidate = environ.get('REMOTE_ADDR', '')
+    if trusted_hops > 0:
+        forwarded = [ip.strip() for ip in environ.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= trusted_hops:
+            candidate = forwarded[-trusted_hops]
+    return normalize_ip(candidate) or normalize_ip(environ.get('REMOTE_ADDR', '')) or 'unknown'
+
+def normalize_ip(value):
+    """Canonical text form of an address, without port or brackets; None if unparsable"""
+    value = value.strip()
+    if value.startswith('['):
+        value = value[1:].split(']', 1)[0]
+    elif value.count(':') == 1:
+        # IPv4 with a port
+        value = value.split(':', 1)[0]
+    try:
+        ip = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return str(ip)
+
+def aggregate_ip(ip, ipv4_prefix=32, ipv6_prefix=64):
+    """Map an address to its network, e.g. 10.1.2.3 -> 10.1.2.0/24 with ipv4_prefix=24"""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    prefix = ipv4_prefix if addr.version == 4 else ipv6_prefix
+    if prefix >= addr.max_prefixlen:
+        return ip
+    return str(ipaddress.ip_network(f'{ip}/{prefix}', strict=False))
+
+def get_client_ip():
+    """Client IP of the current request, resolved once and cached on `g`"""
+    if 'client_ip' not in g:
+        g.client_ip = resolve_client_ip(request.environ, current_app.config.get('TRUSTED_PROXY_HOPS', 1))
+    return g.client_ip
+
+def get_client_key():
+    """Rate limiting key of the current request: the client IP aggregated per network"""
+    if 'client_key' not in g:
+        g.client_key = aggregate_ip(
+            get_client_ip(),
+            current_app.config.get('CLIENT_IPV4_PREFIX', 32),
+            current_app.config.get('CLIENT_IPV6_PREFIX', 64)
+        )
+    return g.client_key
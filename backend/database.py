@@ -0,0 +1,100 @@
+import os
+import threading
+import logging
+from flask import current_app
+from pymongo import MongoClient
+from werkzeug.local import LocalProxy
+
+logger = logging.getLogger(__name__)
+
+class Database:
+    def __init__(self):
+        """
+        Lazily connected MongoDB handle
+
+        No network round trip happens until a collection is first used, so
+        importing the app and create_app() stay fast. The client is not
+        fork-safe: reset() drops it so a forked worker opens its own pool.
+        """
+        self.uri = None
+        self.options = {}
+        self._client = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.uri = app.config.get('MONGODB_URI')
+        self.options = client_options(app.config)
+        self.reset()
+        app.extensions['mongo'] = self
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self.lock:
+                if self._client is None:
+                    if not self.uri:
+                        logger.error('MONGODB_URI environment variable is not set')
+                        raise RuntimeError('MONGODB_URI is required')
+                    self._client = MongoClient(self.uri, **self.options)
+        return self._client
+
+    @property
+    def db(self):
+        # Use default database from URI
+        return self.client.get_default_database()
+
+    @property
+    def students(self):
+        return self.db.students
+
+    @property
+    def messages(self):
+        return self.db.messages
+
+    @property
+    def duplicates(self):
+        return self.db.duplicates
+
+    @property
+    def rate_limits(self):
+        return self.db.rate_limits
+
+    def reset(self):
+        """Forget the current client; the next access reconnects"""
+        with self.lock:
+            self._client = None
+
+def client_options(config):
+    """MongoClient pool and write options from the app config, shared by the sync and async clients"""
+    return {
+        'serverSelectionTimeoutMS': config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        'connectTimeoutMS': config.get('MONGO_CONNECT_TIMEOUT_MS', 5000),
+        'maxPoolSize': config.get('MONGO_MAX_POOL_SIZE', 50),
+        'minPoolSize': config.get('MONGO_MIN_POOL_SIZE', 0),
+        'maxIdleTimeMS': config.get('MONGO_MAX_IDLE_TIME_MS', 60000),
+        'compressors': config.get('MONGO_COMPRESSORS', 'zlib'),
+        'w': config.get('MONGO_WRITE_CONCERN', 'majority'),
+        'retryWrites': config.get('MONGO_RETRY_WRITES', True),
+        'appname': 'math-summer-camp-api',
+        # Command listeners, such as the metrics timer added by add_metrics()
+        'event_listeners': list(config.get('MONGO_EVENT_LISTENERS', [])),
+    }
+
+# Database of the current app: each create_app() binds its own Database in app.extensions
+mongo = LocalProxy(lambda: current_app.extensions['mongo'])
+
+def config_from_env():
+    """MongoDB settings read from the environment"""
+    config = {'MONGODB_URI': os.environ.get('MONGODB_URI')}
+    for key in ('MONGO_MAX_POOL_SIZE', 'MONGO_MIN_POOL_SIZE', 'MONGO_MAX_IDLE_TIME_MS',
+                'MONGO_SERVER_SELECTION_TIMEOUT_MS', 'MONGO_CONNECT_TIMEOUT_MS'):
+        if os.environ.get(key):
+            config[key] = int(os.environ[key])
+    if os.environ.get('MONGO_COMPRESSORS'):
+        config['MONGO_COMPRESSORS'] = os.environ['MONGO_COMPRESSORS']
+    if os.environ.get('MONGO_WRITE_CONCERN'):
+        w = os.environ['MONGO_WRITE_CONCERN']
+        config['MONGO_WRITE_CONCERN'] = int(w) if w.isdigit() else w
+    if os.environ.get('MONGO_RETRY_WRITES'):
+        config['MONGO_RETRY_WRITES'] = os.environ['MONGO_RETRY_WRITES'].lower() == 'true'
+    return config
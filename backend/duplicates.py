@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import threading
+import logging
+from datetime import datetime
+from input_validator import normalize_phone
+from search import WORD_RE, fold, trigrams
+
+logger = logging.getLogger(__name__)
+
+# Share of the pair score carried by each attribute; identical on all of them scores 1
+SCORE_WEIGHTS = {'nom': 0.6, 'telephone': 0.2, 'ecole': 0.1, 'email': 0.1}
+# Siblings share a phone, a school and often an email: below this name similarity a pair never scores
+MIN_NAME_SIMILARITY = 0.7
+DEDUP_PROJECTION = {'prenom': 1, 'nom': 1, 'telephone': 1, 'ecole': 1, 'email': 1}
+EMAIL_LOCAL_RE = re.compile(r'[^a-z]')
+# Blocks queried most selective first: phone, full name, email stem, then name prefixes
+BLOCK_ORDER = ('t:', 'n:', 'e:', 'p:')
+
+def email_stem(email):
+    """Letters of the local part: jean.doe2@x.bj and jeandoe@y.com share `jeandoe`"""
+    return EMAIL_LOCAL_RE.sub('', fold((email or '').split('@')[0]))
+
+def blocking_keys(doc):
+    """
+    Keys of the blocks a student belongs to; only students sharing a key are compared
+
+    Blocks: normalised phone, full name in any word order, first three
+    letters of nom and prenom, and the letters of the email local part.
+    """
+    tokens = sorted(WORD_RE.findall(fold(f"{doc.get('prenom') or ''} {doc.get('nom') or ''}")))
+    keys = []
+    phone = normalize_phone(doc.get('telephone'))
+    if len(phone) >= 8:
+        keys.append(f't:{phone}')
+    if tokens:
+        keys.append('n:' + ' '.join(tokens))
+    prefixes = sorted(fold(doc.get(f) or '')[:3] for f in ('nom', 'prenom'))
+    if all(prefixes):
+        keys.append('p:' + ':'.join(prefixes))
+    stem = email_stem(doc.get('email'))
+    if len(stem) >= 4:
+        keys.append(f'e:{stem}')
+    return keys
+
+def similarity(a, b):
+    """Dice coefficient of the word trigrams of two texts"""
+    ga, gb = trigrams(a or ''), trigrams(b or '')
+    if not ga or not gb:
+        return 0.0
+    return 2 * len(ga & gb) / (len(ga) + len(gb))
+
+def pair_score(a, b):
+    """
+    Likelihood that two student documents are the same applicant
+
+    Returns:
+        tuple: (score in [0, 1], list of attributes that matched)
+    """
+    name = similarity(f"{a.get('prenom')} {a.get('nom')}", f"{b.get('prenom')} {b.get('nom')}")
+    if name < MIN_NAME_SIMILARITY:
+        return 0.0, []
+    phone_a, phone_b = normalize_phone(a.get('telephone')), normalize_phone(b.get('telephone'))
+    parts = {
+        'nom': name,
+        'telephone': 1.0 if phone_a and phone_a == phone_b else 0.0,
+        'ecole': similarity(a.get('ecole'), b.get('ecole')),
+        'email': 1.0 if email_stem(a.get('email')) and email_stem(a.get('email')) == email_stem(b.get('email')) else 0.0,
+    }
+    score = sum(SCORE_WEIGHTS[k] * v for k, v in parts.items())
+    return round(score, 4), [k for k, v in parts.items() if v >= 0.8]
+
+def pair_id(a, b):
+    first, second = sorted((str(a), str(b)))
+    return f'{first}:{second}'
+
+class DuplicateDetector:
+    def __init__(self, get_students, get_pairs, threshold=0.65, block_limit=200, scan_batch=500):
+        """
+        Blocking-based near-duplicate detection over students
+
+        Each student stores its blocking keys (`dedupKeys`, multikey index) and
+        its normalised phone. Checking a student compares it with the members
+        of its blocks only, so the cost is O(block size), not O(collection).
+        Candidate pairs are upserted into the `duplicates` collection, where an
+        admin can merge or dismiss them. Writes never wait for the check:
+        schedule() wakes a background thread that scans the unchecked students.
+
+        Args:
+            get_students: Callable returning the students collection
+            get_pairs: Callable returning the duplicates collection
+            threshold: Minimum pair score reported
+            block_limit: Maximum students read per block; a larger name
+                prefix block is skipped, any other one is truncated
+            scan_batch: Students read per query of the background scan
+        """
+        self.get_students = get_students
+        self.get_pairs = get_pairs
+        self.threshold = threshold
+        self.block_limit = block_limit
+        self.scan_batch = scan_batch
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def schedule(self):
+        """Have the background scanner of this process check the students inserted since its last pass"""
+        if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+            with self.lock:
+                # Threads do not survive a fork, so each worker starts its own scanner
+                if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    self.thread = threading.Thread(target=self._run, name='duplicate-scanner', daemon=True)
+                    self.thread.start()
+        self.wakeup.set()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                # Workers woken together may check the same students; pair upserts make that harmless
+                while self.scan(limit=self.scan_batch, batch_size=self.scan_batch)[0]:
+                    pass
+            except Exception as e:
+                logger.error(f'Duplicate scan failed, left to the next write: {e}')
+                time.sleep(1)
+
+    def check(self, doc):
+        """
+        Compare one student with its blocks and record the candidate pairs
+
+        Returns:
+            int: Number of candidate pairs found
+        """
+        students = self.get_students()
+        keys = blocking_keys(doc)
+        found, compared = [], {doc['_id']}
+        # One query per block, so a loose block cannot crowd out the members of a selective one
+        for key in sorted(keys, key=lambda k: BLOCK_ORDER.index(k[:2])):
+            block = list(students.find({'dedupKeys': key, '_id': {'$nin': list(compared)}},
+                                       DEDUP_PROJECTION).limit(self.block_limit + 1))
+            if len(block) > self.block_limit:
+                # Keys hold names and phones: only their kind is logged
+                if key.startswith('p:'):
+                    logger.info(f"Skipped a name prefix block of more than {self.block_limit} students for {doc['_id']}")
+                    continue
+                logger.warning(f"Block {key[:2]} truncated to {self.block_limit} students for {doc['_id']}")
+                block = block[:self.block_limit]
+            for other in block:
+                compared.add(other['_id'])
+                score, reasons = pair_score(doc, other)
+                if score >= self.threshold:
+                    found.append((other['_id'], score, reasons))
+        now = datetime.utcnow()
+        pairs = self.get_pairs()
+        for other_id, score, reasons in found:
+            # A pair already dismissed or merged keeps its status
+            pairs.update_one(
+                {'_id': pair_id(doc['_id'], other_id)},
+                {'$set': {'score': score, 'reasons': reasons},
+                 '$setOnInsert': {'students': [doc['_id'], other_id], 'status': 'open', 'detectedAt': now}},
+                upsert=True
+            )
+        students.update_one({'_id': doc['_id']}, {'$set': {
+            'dedupKeys': keys,
+            'telephoneNormalized': normalize_phone(doc.get('telephone')),
+            'dedupCheckedAt': now,
+        }})
+        return len(found)
+
+    def scan(self, limit=None, batch_size=500):
+        """
+        Check the students never checked: imports, buffered or ASGI inserts, older records
+
+        Returns:
+            tuple: (students checked, candidate pairs found)
+        """
+        students = self.get_students()
+        checked = found = 0
+        while limit is None or checked < limit:
+            size = batch_size if limit is None else min(batch_size, limit - checked)
+            batch = list(students.find({'dedupCheckedAt': None}, DEDUP_PROJECTION).limit(size))
+            if not batch:
+                break
+            for doc in batch:
+                found += self.check(doc)
+            checked += len(batch)
+        return checked, found
@@ -0,0 +1,82 @@
+import csv
+import io
+from datetime import datetime
+
+# (column header, student field) in export order
+EXPORT_COLUMNS = [
+    ('ID', '_id'),
+    ('Prénom', 'prenom'),
+    ('Nom', 'nom'),
+    ('Email', 'email'),
+    ('Téléphone', 'telephone'),
+    ('Âge', 'age'),
+    ('Niveau', 'niveau'),
+    ('École', 'ecole'),
+    ('Ville', 'ville'),
+    ('Département', 'departement'),
+    ('Commune', 'commune'),
+    ('Motivation', 'motivation'),
+    ('Date d\'inscription', 'registeredAt'),
+    ('Statut', 'status'),
+    ('Édition', 'edition'),
+]
+
+# Fields read from MongoDB for an export; _id is always returned
+EXPORT_PROJECTION = {field: 1 for _, field in EXPORT_COLUMNS}
+
+EXPORT_BATCH_SIZE = 500
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def iter_rows(docs):
+    """Yield one list of cell values per student document"""
+    for s in docs:
+        row = []
+        for _, field in EXPORT_COLUMNS:
+            value = s.get(field)
+            if field == '_id':
+                value = str(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            row.append(value)
+        yield row
+
+def csv_stream(docs, chunk_rows=EXPORT_BATCH_SIZE):
+    """
+    Generate a CSV export chunk by chunk
+
+    Only one chunk of rows is held in memory at a time; the leading BOM lets
+    Excel detect the UTF-8 encoding of accented headers.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')
+    writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    pending = 0
+    for row in iter_rows(docs):
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    yield buf.getvalue().encode('utf-8')
+
+def write_xlsx(docs, fileobj, sheet_name='Inscriptions'):
+    """
+    Write an XLSX export to fileobj with a write-only workbook
+
+    Rows are flushed to disk as they are appended, so memory does not grow
+    with the number of students.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([header for header, _ in EXPORT_COLUMNS])
+    for row in iter_rows(docs):
+        ws.append(row)
+    wb.save(fileobj)
+    fileobj.seek(0)
+    return fileobj
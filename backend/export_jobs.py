@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_EXTENSIONS = ('xlsx', 'csv')
+
+class ExportJobManager:
+    def __init__(self, directory, max_workers=2, max_bytes=200 * 1024 * 1024, max_age=24 * 3600,
+                 stale_after=1800):
+        """
+        Run exports in a thread pool and cache the finished files on disk
+
+        Jobs are identified by a content key derived from the dataset version,
+        so an unchanged dataset maps to the same job and the same artifact.
+        Everything lives in `directory`, so every worker process sharing it
+        sees the same jobs: the artifact `<key>.<ext>`, the job record
+        `<key>.json` (replaced atomically on every change) and, while a build
+        runs, the marker `<key>.claim`, created exclusively by the one process
+        that builds it.
+
+        Args:
+            directory: Folder holding the cached artifacts and job records
+            max_workers: Number of exports built concurrently by this process
+            max_bytes: Total size the cache is trimmed to, oldest files first
+            max_age: Seconds after which an artifact is evicted
+            stale_after: Seconds after which the claim of a build that never
+                finished (its worker died) is taken over
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stale_after = stale_after
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        os.makedirs(directory, exist_ok=True)
+
+    def artifact_path(self, key, ext):
+        return os.path.join(self.directory, f'{key}.{ext}')
+
+    def status_path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def claim_path(self, key):
+        return os.path.join(self.directory, f'{key}.claim')
+
+    def find_artifact(self, key):
+        """Return (path, ext) of a finished artifact for key, or (None, None)"""
+        for ext in ARTIFACT_EXTENSIONS:
+            path = self.artifact_path(key, ext)
+            if os.path.exists(path):
+                return path, ext
+        return None, None
+
+    def submit(self, key, ext, build):
+        """
+        Start building an artifact unless it is cached or already running in any process
+
+        Args:
+            key: Content key of the export (hex digest)
+            ext: Artifact extension, one of ARTIFACT_EXTENSIONS
+            build: Callable writing the export into the binary file object it receives
+
+        Returns:
+            dict: The job record
+        """
+        path = self.artifact_path(key, ext)
+        if os.path.exists(path):
+            # Refresh the mtime so the eviction policy treats it as recently used
+            os.utime(path)
+            return {'id': key, 'format': ext, 'status': 'done', 'cached': True,
+                    'createdAt': time.time(), 'finishedAt': time.time(), 'error': None}
+        if not self._claim(key):
+            job = self._read(key)
+            if job and job['status'] in ('queued', 'running'):
+                return job
+            # Claimed a moment ago, its record is not written yet
+            return {'id': key, 'format': ext, 'status': 'queued', 'cached': False,
+                    'createdAt': time.time(), 'finishedAt': None, 'error': None}
+        job = {'id': key, 'format': ext, 'status': 'queued', 'cached': False,
+               'createdAt': time.time(), 'finishedAt': None, 'error': None}
+        self._write(job)
+        self.executor.submit(self._run, job, build)
+        return dict(job)
+
+    def get(self, key):
+        """Return the job record for key, falling back to an artifact on disk"""
+        job = self._read(key)
+        path, ext = self.find_artifact(key)
+        if job and (job['status'] != 'done' or path):
+            return job
+        if path:
+            return {'id': key, 'format': ext, 'status': 'done', 'cached': True,
+                    'createdAt': os.path.getmtime(path), 'finishedAt': os.path.getmtime(path), 'error': None}
+        return None
+
+    def _claim(self, key):
+        """Create the claim marker of key; False when another build holds it"""
+        path = self.claim_path(key)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - os.path.getmtime(path) <= self.stale_after:
+                return False
+            logger.warning(f'Export job {key} claimed too long ago, building it again')
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            # Released in the meantime
+            return self._claim(key)
+
+    def _read(self, key):
+        try:
+            with open(self.status_path(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, job):
+        path = self.status_path(job['id'])
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _run(self, job, build):
+        key = job['id']
+        self._write({**job, 'status': 'running'})
+        path = self.artifact_path(key, job['format'])
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as fileobj:
+                build(fileobj)
+            os.replace(tmp_path, path)
+            self._write({**job, 'status': 'done', 'finishedAt': time.time()})
+        except Exception as e:
+            logger.error(f'Export job {key} failed: {e}')
+            self._write({**job, 'status': 'failed', 'error': 'Erreur lors de la génération de l\'export',
+                         'finishedAt': time.time()})
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            self._remove(self.claim_path(key))
+        self.evict()
+
+    def evict(self):
+        """Delete artifacts older than max_age, then the oldest ones until under max_bytes"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            ext = name.rsplit('.', 1)[-1]
+            if ext not in ARTIFACT_EXTENSIONS and ext != 'json':
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            elif ext != 'json':
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            # The record of an evicted artifact would report a file that is gone
+            self._remove(self.status_path(os.path.basename(path).rsplit('.', 1)[0]))
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
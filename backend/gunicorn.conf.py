@@ -0,0 +1,79 @@
+"""
+Gunicorn settings for production
+
+Loaded automatically by `gunicorn app:app` when started from this directory.
+Every value can be overridden through the environment variables below.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+def available_cpus():
+    """CPUs this container may use: its cgroup quota, else the affinity mask, not the host's count"""
+    for quota_file, period_file in (('/sys/fs/cgroup/cpu.max', None),
+                                    ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', '/sys/fs/cgroup/cpu/cpu.cfs_period_us')):
+        try:
+            with open(quota_file) as f:
+                values = f.read().split()
+            if period_file:
+                with open(period_file) as f:
+                    values.append(f.read().strip())
+            quota, period = values[0], values[1]
+            if quota not in ('max', '-1'):
+                return max(1, int(quota) // int(period))
+        except (OSError, ValueError, IndexError):
+            continue
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+# Requests mostly wait on MongoDB, so a few processes with several threads each
+# keep the CPU busy without the memory cost of one process per connection.
+# Each worker holds its own caches and search indexes: the default stays small
+# and WEB_CONCURRENCY raises it when the instance has the memory for more.
+workers = int(os.environ.get('WEB_CONCURRENCY', min(available_cpus() + 1, 4)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import the app once in the master and fork it, so workers start fast and share memory
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+# Render's proxy reuses connections; keep them open a little longer than its idle timeout
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+
+# Recycle workers periodically, staggered so they do not all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def post_fork(server, worker):
+    # The MongoClient created while preloading belongs to the master; open a fresh one per worker
+    if preload_app:
+        import app
+        app.app.extensions['mongo'].reset()
+
+def on_starting(server):
+    # Snapshots left by a previous run would be summed with this one
+    directory = os.environ.get('METRICS_DIR')
+    if directory and os.path.isdir(directory):
+        for entry in os.listdir(directory):
+            if entry.startswith('metrics_'):
+                os.remove(os.path.join(directory, entry))
+
+def worker_exit(server, worker):
+    # Write the latest counts before the worker goes away
+    import app
+    app.app.extensions['metrics'].flush(force=True)
+
+def child_exit(server, worker):
+    directory = os.environ.get('METRICS_DIR')
+    if directory:
+        from metrics import fold_exited_worker
+        fold_exited_worker(directory, worker.pid)
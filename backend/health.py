@@ -0,0 +1,45 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ReadinessProbe:
+    def __init__(self, ping, ttl=10.0):
+        """
+        Cache the result of a backend ping for a short time
+
+        Args:
+            ping: Callable raising an exception when the backend is unreachable
+            ttl: Number of seconds a ping result is reused
+        """
+        self.ping = ping
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.ready = False
+        self.checked_at = 0.0
+        self.error = None
+
+    def check(self):
+        """
+        Return the cached readiness, pinging the backend once the TTL expired
+
+        Returns:
+            tuple: (ready, error message or None, age of the result in seconds)
+        """
+        now = time.monotonic()
+        if now - self.checked_at < self.ttl:
+            return self.ready, self.error, now - self.checked_at
+
+        with self.lock:
+            # Another thread may have refreshed the result while we waited
+            now = time.monotonic()
+            if now - self.checked_at >= self.ttl:
+                try:
+                    self.ping()
+                    self.ready, self.error = True, None
+                except Exception as e:
+                    logger.error(f'Readiness ping failed: {e}')
+                    self.ready, self.error = False, str(e)
+                self.checked_at = time.monotonic()
+            return self.ready, self.error, time.monotonic() - self.checked_at
@@ -0,0 +1,86 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+logger = logging.getLogger(__name__)
+
+# Every list query sorts on (registeredAt, _id) DESC, so each filter prefix
+# is followed by the keyset fields to keep filtered pages on a single index range
+STUDENT_INDEXES = [
+    ([('email', ASCENDING)], {'unique': True}),
+    ([('registeredAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('status', ASCENDING), ('registeredAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('niveau', ASCENDING), ('registeredAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('departement', ASCENDING), ('commune', ASCENDING), ('registeredAt', DESCENDING), ('_id', DESCENDING)], {}),
+    # Latest status change, part of the dataset version used by cached exports and list ETags
+    ([('statusUpdatedAt', DESCENDING)], {}),
+    # /api/search: French stemming, names weighted above the free text
+    ([('prenom', TEXT), ('nom', TEXT), ('ecole', TEXT), ('ville', TEXT), ('commune', TEXT), ('motivation', TEXT)],
+     {'name': 'students_text', 'default_language': 'french',
+      'weights': {'prenom': 10, 'nom': 10, 'ecole': 5, 'ville': 3, 'commune': 3, 'motivation': 1}}),
+    # Duplicate detection: blocks (multikey, phones included as `t:` keys) and the queue of unchecked students
+    ([('dedupKeys', ASCENDING)], {}),
+    ([('dedupCheckedAt', ASCENDING)], {}),
+]
+
+# The unread inbox (status=new) and interest filters resolve to one range on these
+MESSAGE_INDEXES = [
+    ([('createdAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('status', ASCENDING), ('createdAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('interest', ASCENDING), ('createdAt', DESCENDING), ('_id', DESCENDING)], {}),
+    # Latest status change, part of the dataset version behind list ETags
+    ([('statusUpdatedAt', DESCENDING)], {}),
+    ([('name', TEXT), ('email', TEXT), ('message', TEXT)],
+     {'name': 'messages_text', 'default_language': 'french', 'weights': {'name': 10, 'email': 5, 'message': 1}}),
+]
+
+# Candidate duplicate pairs, reviewed best first
+DUPLICATE_INDEXES = [
+    ([('status', ASCENDING), ('score', DESCENDING), ('_id', ASCENDING)], {}),
+    ([('students', ASCENDING)], {}),
+]
+
+# Past editions moved out by `archive-editions`: read by edition, newest first. Emails are
+# not unique there, since the same student may have applied to several editions
+STUDENT_ARCHIVE_INDEXES = [
+    ([('edition', ASCENDING), ('registeredAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('registeredAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('email', ASCENDING)], {}),
+]
+
+MESSAGE_ARCHIVE_INDEXES = [
+    ([('edition', ASCENDING), ('createdAt', DESCENDING), ('_id', DESCENDING)], {}),
+    ([('createdAt', DESCENDING), ('_id', DESCENDING)], {}),
+]
+
+# Shared rate limiter counters expire on their own
+RATE_LIMIT_INDEXES = [
+    ([('expiresAt', ASCENDING)], {'expireAfterSeconds': 0}),
+]
+
+# Indexes no query uses any more, dropped from existing databases
+OBSOLETE_INDEXES = {
+    'students': ['telephoneNormalized_1'],
+}
+
+def ensure_indexes(db):
+    """Create the indexes the API queries rely on; failures are logged, not raised"""
+    for collection, specs in (('students', STUDENT_INDEXES), ('messages', MESSAGE_INDEXES),
+                              ('students_archive', STUDENT_ARCHIVE_INDEXES),
+                              ('messages_archive', MESSAGE_ARCHIVE_INDEXES),
+                              ('duplicates', DUPLICATE_INDEXES), ('rate_limits', RATE_LIMIT_INDEXES)):
+        for keys, options in specs:
+            try:
+                db[collection].create_index(keys, **options)
+            except Exception as idx_err:
+                logger.error(f"Could not create index {keys} on {collection}: {idx_err}")
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = set()
+        try:
+            existing = set(db[collection].index_information())
+        except Exception as idx_err:
+            logger.error(f"Could not list the indexes of {collection}: {idx_err}")
+        for name in existing.intersection(names):
+            try:
+                db[collection].drop_index(name)
+            except Exception as idx_err:
+                logger.error(f"Could not drop index {name} on {collection}: {idx_err}")
@@ -0,0 +1,247 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_EMAIL_ERROR = 'Cette adresse email est déjà utilisée'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_status ON submissions (status);
+"""
+
+class IngestQueue:
+    def __init__(self, path, get_collection, batch_size=500, flush_interval=0.2,
+                 retention=7 * 24 * 3600, stale_after=60, on_stored=None):
+        """
+        Write-behind journal for validated submissions
+
+        Documents are appended to a SQLite journal (WAL mode) and acknowledged
+        immediately; a background thread group-commits them into MongoDB with
+        unordered insert_many batches. The journal survives restarts, and rows
+        keep their outcome so clients can look a submission up by id.
+
+        Args:
+            path: SQLite file of the journal
+            get_collection: Callable mapping a collection name to a Mongo collection
+            batch_size: Maximum documents per insert_many
+            flush_interval: Seconds the flusher sleeps when the journal is empty
+            retention: Seconds finished rows are kept for status lookups
+            stale_after: Seconds after which rows claimed by a dead flusher are retried
+            on_stored: Called with a collection name once a flush stored
+                documents into it, e.g. to invalidate caches
+        """
+        self.path = path
+        self.get_collection = get_collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.stale_after = stale_after
+        self.on_stored = on_stored
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """One SQLite connection per thread (and per process after a fork)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL + NORMAL survives process crashes and restarts; only an OS crash can lose the last commits
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def enqueue(self, collection, doc):
+        """
+        Journal a document that already carries its final `_id`
+
+        Returns:
+            str: Submission id, equal to the document id
+        """
+        self.start()
+        now = time.time()
+        submission_id = str(doc['_id'])
+        self.connection().execute(
+            'INSERT INTO submissions (id, collection, doc, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (submission_id, collection, json_util.dumps(doc), 'queued', now, now)
+        )
+        self.wakeup.set()
+        return submission_id
+
+    def status(self, submission_id):
+        row = self.connection().execute(
+            'SELECT collection, status, error, created_at, updated_at FROM submissions WHERE id = ?',
+            (submission_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        collection, status, error, created_at, updated_at = row
+        # A row being flushed is still pending from the client's point of view
+        return {'id': submission_id, 'collection': collection,
+                'status': 'queued' if status == 'flushing' else status,
+                'error': error, 'createdAt': created_at, 'updatedAt': updated_at}
+
+    def pending(self):
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM submissions WHERE status IN ('queued', 'flushing')"
+        ).fetchone()[0]
+
+    def start(self):
+        """Start the flusher thread in this process if it is not running"""
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        last_purge = 0.0
+        while True:
+            try:
+                flushed = self.flush()
+                if time.time() - last_purge > 3600:
+                    self.purge()
+                    last_purge = time.time()
+            except Exception as e:
+                logger.error(f'Ingest flush failed, will retry: {e}')
+                flushed = 0
+                time.sleep(1)
+            if not flushed:
+                self.wakeup.wait(self.flush_interval)
+                self.wakeup.clear()
+
+    def _claim(self):
+        """
+        Atomically mark the next batch as owned by this flush
+
+        Returns:
+            tuple: (claim token, rows of the batch)
+        """
+        conn = self.connection()
+        now = time.time()
+        # Stored in `owner`; the pid prefix tells which process holds the rows
+        token = f'{os.getpid()}:{uuid.uuid4().hex}'
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "UPDATE submissions SET status = 'queued', owner = NULL "
+                "WHERE status = 'flushing' AND updated_at < ?",
+                (now - self.stale_after,)
+            )
+            conn.execute(
+                "UPDATE submissions SET status = 'flushing', owner = ?, updated_at = ? WHERE rowid IN "
+                "(SELECT rowid FROM submissions WHERE status = 'queued' ORDER BY rowid LIMIT ?)",
+                (token, now, self.batch_size)
+            )
+            rows = conn.execute(
+                "SELECT id, collection, doc FROM submissions WHERE status = 'flushing' AND owner = ? ORDER BY rowid",
+                (token,)
+            ).fetchall()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return token, rows
+
+    def flush(self):
+        """
+        Insert one claimed batch per collection
+
+        Rows of a collection whose insert failed for any other reason than
+        per-document write errors (e.g. MongoDB unreachable) go back to the
+        queue for the next flush, and the error is raised once the other
+        outcomes are recorded.
+
+        Returns:
+            int: Number of journal rows processed
+        """
+        token, rows = self._claim()
+        if not rows:
+            return 0
+        by_collection = {}
+        for submission_id, collection, doc in rows:
+            by_collection.setdefault(collection, []).append((submission_id, json_util.loads(doc)))
+
+        outcomes, released, error = [], [], None
+        for collection, entries in by_collection.items():
+            try:
+                outcomes += self._insert(collection, entries)
+            except Exception as e:
+                error = error or e
+                released += [submission_id for submission_id, _ in entries]
+
+        now = time.time()
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
+            'UPDATE submissions SET status = ?, error = ?, owner = NULL, updated_at = ? WHERE id = ? AND owner = ?',
+            [(status, error_message, now, submission_id, token) for submission_id, status, error_message in outcomes]
+        )
+        conn.executemany(
+            "UPDATE submissions SET status = 'queued', owner = NULL, updated_at = ? WHERE id = ? AND owner = ?",
+            [(now, submission_id, token) for submission_id in released]
+        )
+        conn.execute('COMMIT')
+
+        if self.on_stored is not None:
+            names = {collection for collection, entries in by_collection.items()
+                     if any(submission_id not in released for submission_id, _ in entries)}
+            for collection in names:
+                try:
+                    self.on_stored(collection)
+                except Exception as e:
+                    logger.error(f'Post-flush hook failed for {collection}: {e}')
+        if error is not None:
+            raise error
+        return len(rows)
+
+    def _insert(self, collection, entries):
+        docs = [doc for _, doc in entries]
+        try:
+            self.get_collection(collection).insert_many(docs, ordered=False)
+            return [(submission_id, 'stored', None) for submission_id, _ in entries]
+        except BulkWriteError as bwe:
+            failed = {}
+            for err in bwe.details.get('writeErrors', []):
+                submission_id = entries[err['index']][0]
+                if err.get('code') != 11000:
+                    logger.error(f'Ingest insert error for {submission_id}: {err.get("errmsg")}')
+                    failed[submission_id] = ('failed', 'Erreur lors de la sauvegarde')
+                elif '_id' in (err.get('keyPattern') or {}):
+                    # Inserted by an earlier flush that died before recording it
+                    failed[submission_id] = ('stored', None)
+                else:
+                    failed[submission_id] = ('duplicate', DUPLICATE_EMAIL_ERROR)
+            return [(submission_id, *failed.get(submission_id, ('stored', None))) for submission_id, _ in entries]
+
+    def purge(self):
+        """Forget finished submissions older than the retention period"""
+        self.connection().execute(
+            "DELETE FROM submissions WHERE status IN ('stored', 'duplicate', 'failed') AND updated_at < ?",
+            (time.time() - self.retention,)
+        )
@@ -1,51 +1,183 @@
 import re
 from typing import Dict, Any, List
-from flask import jsonify
+
+# Control chars, angle brackets and quotes. A compiled character class beats
+# str.translate here: translate drops off its fast path on accented French text
+UNSAFE_CHARS_RE = re.compile(r"[<>\"'\x00-\x1f\x7f-\x9f]")
+
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[A-Za-z]{2,}')
+# +229 12345678, 12345678 or international +22912345678
+PHONE_RE = re.compile(r'\+229\s?[0-9]{8}|\+?[0-9]{8,15}')
+
+NON_DIGITS_RE = re.compile(r'\D')
+
+NIVEAUX = frozenset(['quatrieme', 'troisieme', 'seconde', 'premiere', 'terminale'])
+INTERESTS = frozenset(['participant', 'parent', 'intervenant', 'partenaire'])
+
+def sanitize_string(text: str, max_length: int = 1000) -> str:
+    """Remove control chars, angle brackets and quotes, then trim and truncate"""
+    if not isinstance(text, str):
+        return ''
+    return UNSAFE_CHARS_RE.sub('', text).strip()[:max_length]
+
+def validate_email(email: str) -> bool:
+    return bool(email and isinstance(email, str) and len(email) <= 254 and EMAIL_RE.fullmatch(email.strip()))
+
+def validate_phone(phone: str) -> bool:
+    if not phone:
+        return True
+    return bool(PHONE_RE.fullmatch(phone.strip()))
+
+def normalize_phone(phone: str) -> str:
+    """
+    Canonical digits of a phone number, so `+229 12345678`, `0022912345678`
+    and `12345678` compare equal. The 10-digit `01` numbering maps to the
+    8-digit number it extends.
+    """
+    digits = NON_DIGITS_RE.sub('', phone or '')
+    if digits.startswith('00'):
+        digits = digits[2:]
+    if digits.startswith('229') and len(digits) in (11, 13):
+        digits = digits[3:]
+    if len(digits) == 10 and digits.startswith('01'):
+        digits = digits[2:]
+    return digits
+
+class Field:
+    """Declarative spec of one payload field"""
+    __slots__ = ('name', 'kind', 'required', 'max_length', 'min_length', 'choices',
+                 'min_value', 'max_value', 'error')
+
+    def __init__(self, name, kind='text', required=True, max_length=100, min_length=0,
+                 choices=None, min_value=None, max_value=None, error=None):
+        """
+        Args:
+            name: Key in the JSON payload
+            kind: One of 'text', 'email', 'phone', 'int', 'enum'
+            required: Reject missing or blank values
+            max_length: Length the sanitized text is truncated to
+            min_length: Minimum length of the sanitized text
+            choices: Allowed values of an 'enum' field
+            min_value, max_value: Inclusive bounds of an 'int' field
+            error: Message returned when the value is invalid
+        """
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.max_length = max_length
+        self.min_length = min_length
+        self.choices = choices
+        self.min_value = min_value
+        self.max_value = max_value
+        self.error = error
+
+class Schema:
+    def __init__(self, fields: List[Field]):
+        self.fields = fields
+        self.required = [f.name for f in fields if f.required]
+
+    def validate(self, data: Any) -> tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Validate and sanitize a payload in a single pass over the field specs
+
+        Returns:
+            tuple: (cleaned values, field name -> error message); every invalid
+            field is reported, not only the first one
+        """
+        if not isinstance(data, dict):
+            return {}, {'_': 'Données invalides'}
+        cleaned, errors = {}, {}
+        for spec in self.fields:
+            value = data.get(spec.name)
+            if not value or (isinstance(value, str) and not value.strip()):
+                if spec.required:
+                    errors[spec.name] = 'Champ requis'
+                else:
+                    cleaned[spec.name] = ''
+                continue
+
+            kind = spec.kind
+            if kind == 'text':
+                value = sanitize_string(value, spec.max_length)
+                if len(value) < spec.min_length:
+                    errors[spec.name] = spec.error
+                    continue
+            elif kind == 'email':
+                value = value.strip().lower() if isinstance(value, str) else ''
+                if not validate_email(value):
+                    errors[spec.name] = spec.error
+                    continue
+            elif kind == 'phone':
+                value = sanitize_string(value, spec.max_length)
+                if not validate_phone(value):
+                    errors[spec.name] = spec.error
+                    continue
+            elif kind == 'int':
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    errors[spec.name] = spec.error
+                    continue
+                if not spec.min_value <= value <= spec.max_value:
+                    errors[spec.name] = spec.error
+                    continue
+            elif kind == 'enum':
+                value = value.strip() if isinstance(value, str) else None
+                if value not in spec.choices:
+                    errors[spec.name] = spec.error
+                    continue
+            cleaned[spec.name] = value
+        return cleaned, errors
+
+    def error_message(self, errors: Dict[str, str]) -> str:
+        """Summarize field errors into the single `error` string of the API contract"""
+        missing = [f for f in self.required if errors.get(f) == 'Champ requis']
+        if missing:
+            return f'Champs manquants: {", ".join(missing)}'
+        return next(iter(errors.values()))
+
+STUDENT_SCHEMA = Schema([
+    Field('prenom'),
+    Field('nom'),
+    Field('email', 'email', error="Format d'email invalide"),
+    Field('telephone', 'phone', max_length=20, error="Format de téléphone invalide"),
+    Field('age', 'int', min_value=14, max_value=18, error="L'âge doit être entre 14 et 18 ans"),
+    Field('niveau', 'enum', choices=NIVEAUX, error="Niveau scolaire invalide"),
+    Field('ecole', max_length=200),
+    Field('ville'),
+    Field('departement'),
+    Field('commune'),
+    Field('motivation', max_length=2000, min_length=50,
+          error="La motivation doit contenir au moins 50 caractères"),
+])
+
+CONTACT_SCHEMA = Schema([
+    Field('name'),
+    Field('email', 'email', error="Format d'email invalide"),
+    Field('phone', 'phone', required=False, max_length=20, error="Format de téléphone invalide"),
+    Field('interest', 'enum', choices=INTERESTS, error="Type d'intérêt invalide"),
+    Field('message', max_length=2000, min_length=10,
+          error="Le message doit contenir au moins 10 caractères"),
+])
 
 class InputValidator:
-    """Input validation and sanitization utilities"""
-    
+    """Input validation and sanitization utilities, backed by the schemas above"""
+
     @staticmethod
     def validate_email(email: str) -> bool:
         """Validate email format"""
-        if not email or len(email) > 254:
-            return False
-        
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email))
-    
+        return validate_email(email)
+
     @staticmethod
     def validate_phone(phone: str) -> bool:
         """Validate phone number format"""
-        if not phone:
-            return True  # Phone is optional
-        
-        # Remove spaces and special characters
-        clean_phone = re.sub(r'[^\d+]', '', phone)
-        
-        # Benin format: +229 followed by 8 digits or just 8 digits
-        patterns = [
-            r'^\+229[0-9]{8}$',  # +229 + 8 digits
-            r'^[0-9]{8}$',       # 8 digits
-            r'^\+?[0-9]{8,15}$'  # International format
-        ]
-        
-        return any(re.match(pattern, clean_phone) for pattern in patterns)
-    
+        return validate_phone(phone)
+
     @staticmethod
     def sanitize_string(text: str, max_length: int = 1000) -> str:
         """Sanitize string input"""
-        if not isinstance(text, str):
-            return ""
-        
-        # Remove potentially dangerous characters
-        sanitized = re.sub(r'[<>"\'\x00-\x1f\x7f-\x9f]', '', text)
-        
-        # Trim whitespace and limit length
-        sanitized = sanitized.strip()[:max_length]
-        
-        return sanitized
-    
+        return sanitize_string(text, max_length)
+
     @staticmethod
     def validate_age(age: Any) -> tuple[bool, int]:
         """Validate age input"""
@@ -56,7 +188,7 @@ class InputValidator:
             return False, 0
         except (ValueError, TypeError):
             return False, 0
-    
+
     @staticmethod
     def validate_required_fields(data: Dict[str, Any], required_fields: List[str]) -> tuple[bool, str]:
         """Validate that all required fields are present and not empty"""
@@ -64,81 +196,19 @@ class InputValidator:
             if field not in data or not data[field] or (isinstance(data[field], str) and not data[field].strip()):
                 return False, f"Le champ {field} est requis"
         return True, ""
-    
+
     @staticmethod
     def validate_student_data(data: Dict[str, Any]) -> tuple[bool, str, Dict[str, Any]]:
         """Validate and sanitize student registration data"""
-        required_fields = ['prenom', 'nom', 'email', 'telephone', 'age', 'niveau', 'ecole', 'ville', 'departement', 'commune', 'motivation']
-        
-        # Check required fields
-        is_valid, error_msg = InputValidator.validate_required_fields(data, required_fields)
-        if not is_valid:
-            return False, error_msg, {}
-        
-        # Validate email
-        if not InputValidator.validate_email(data['email']):
-            return False, "Format d'email invalide", {}
-        
-        # Validate phone
-        if not InputValidator.validate_phone(data['telephone']):
-            return False, "Format de téléphone invalide", {}
-        
-        # Validate age
-        age_valid, age_value = InputValidator.validate_age(data['age'])
-        if not age_valid:
-            return False, "L'âge doit être entre 14 et 18 ans", {}
-        
-        # Validate niveau
-        valid_niveaux = ['quatrieme', 'troisieme', 'seconde', 'premiere', 'terminale']
-        if data['niveau'] not in valid_niveaux:
-            return False, "Niveau scolaire invalide", {}
-        
-        # Sanitize string fields
-        sanitized_data = {}
-        string_fields = ['prenom', 'nom', 'niveau', 'ecole', 'ville', 'departement', 'commune']
-        for field in string_fields:
-            sanitized_data[field] = InputValidator.sanitize_string(data[field], 100)
-        
-        # Special handling for motivation (longer text)
-        sanitized_data['motivation'] = InputValidator.sanitize_string(data['motivation'], 2000)
-        
-        # Email and phone (already validated)
-        sanitized_data['email'] = data['email'].lower().strip()
-        sanitized_data['telephone'] = data['telephone'].strip()
-        sanitized_data['age'] = age_value
-        
-        return True, "", sanitized_data
-    
+        cleaned, errors = STUDENT_SCHEMA.validate(data)
+        if errors:
+            return False, STUDENT_SCHEMA.error_message(errors), {}
+        return True, "", cleaned
+
     @staticmethod
     def validate_contact_data(data: Dict[str, Any]) -> tuple[bool, str, Dict[str, Any]]:
         """Validate and sanitize contact form data"""
-        required_fields = ['name', 'email', 'message', 'interest']
-        
-        # Check required fields
-        is_valid, error_msg = InputValidator.validate_required_fields(data, required_fields)
-        if not is_valid:
-            return False, error_msg, {}
-        
-        # Validate email
-        if not InputValidator.validate_email(data['email']):
-            return False, "Format d'email invalide", {}
-        
-        # Validate phone if provided
-        if data.get('phone') and not InputValidator.validate_phone(data['phone']):
-            return False, "Format de téléphone invalide", {}
-        
-        # Validate interest
-        valid_interests = ['participant', 'parent', 'intervenant', 'partenaire']
-        if data['interest'] not in valid_interests:
-            return False, "Type d'intérêt invalide", {}
-        
-        # Sanitize data
-        sanitized_data = {
-            'name': InputValidator.sanitize_string(data['name'], 100),
-            'email': data['email'].lower().strip(),
-            'phone': data.get('phone', '').strip(),
-            'interest': data['interest'],
-            'message': InputValidator.sanitize_string(data['message'], 2000)
-        }
-        
-        return True, "", sanitized_data
\ No newline at end of file
+        cleaned, errors = CONTACT_SCHEMA.validate(data)
+        if errors:
+            return False, CONTACT_SCHEMA.error_message(errors), {}
+        return True, "", cleaned
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import random
+import cProfile
+import threading
+import logging
+from bisect import bisect_left
+from flask import Flask, Response, g, request
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Counters and histograms of one process, rendered in the Prometheus text format
+
+        Series are keyed by their label values. With a shared `directory`
+        (METRICS_DIR), every gunicorn worker writes its snapshot there and
+        render() sums the snapshots of all workers, so a scrape landing on
+        any worker sees the whole server.
+        """
+        self.lock = threading.Lock()
+        # name -> (type, help, label names, buckets)
+        self.meta = {}
+        # name -> {label values: value, or [bucket counts..., sum, count] for histograms}
+        self.series = {}
+        self.directory = None
+        self.flush_interval = 5.0
+        self.flushed_at = 0.0
+
+    def counter(self, name, help, labels):
+        self.meta[name] = ('counter', help, labels, None)
+        self.series[name] = {}
+
+    def histogram(self, name, help, labels, buckets):
+        self.meta[name] = ('histogram', help, labels, buckets)
+        self.series[name] = {}
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            values = self.series[name]
+            values[labels] = values.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = self.meta[name][3]
+        with self.lock:
+            values = self.series[name]
+            row = values.get(labels)
+            if row is None:
+                # One count per bucket plus +Inf, then sum and count; made cumulative when rendered
+                row = values[labels] = [0] * (len(buckets) + 3)
+            row[bisect_left(buckets, value)] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {name: [[list(labels), list(v) if isinstance(v, list) else v] for labels, v in values.items()]
+                    for name, values in self.series.items()}
+
+    def flush(self, force=False):
+        """Write this worker's snapshot to the shared directory, at most every flush_interval"""
+        if not self.directory or (not force and time.monotonic() - self.flushed_at < self.flush_interval):
+            return
+        self.flushed_at = time.monotonic()
+        path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+        try:
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.warning(f'Could not write metrics snapshot: {e}')
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for entry in os.listdir(self.directory):
+            if entry.startswith('metrics_') and entry.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, entry)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    # Being replaced by its worker right now
+                    continue
+        return snapshots
+
+    def render(self):
+        # Snapshots of exited workers stay in the sum, so counters never go backwards
+        merged = merge_snapshots(self._snapshots())
+        lines = []
+        for name, (kind, help, label_names, buckets) in self.meta.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = [f'{n}="{escape(v)}"' for n, v in zip(label_names, key)]
+                if kind == 'counter':
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value):
+                    cumulative += count
+                    bucket_labels = format_labels(labels + [f'le="{bound}"'])
+                    lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {round(value[-2], 6)}')
+                lines.append(f'{name}_count{format_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+def merge_snapshots(snapshots):
+    """Sum snapshots series by series: {name: {label values: value}}"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, rows in snapshot.items():
+            series = merged.setdefault(name, {})
+            for labels, value in rows:
+                key = tuple(labels)
+                if isinstance(value, list):
+                    total = series.get(key) or [0] * len(value)
+                    series[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    series[key] = series.get(key, 0) + value
+    return merged
+
+def fold_exited_worker(directory, pid):
+    """
+    Add the snapshot of an exited worker to metrics_exited.json and remove it
+
+    Called by the gunicorn master, so recycled workers do not leave one file each.
+    """
+    path = os.path.join(directory, f'metrics_{pid}.json')
+    exited = os.path.join(directory, 'metrics_exited.json')
+    snapshots = []
+    for name in (exited, path):
+        try:
+            with open(name) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    merged = merge_snapshots(snapshots)
+    with open(f'{exited}.tmp', 'w') as f:
+        json.dump({name: [[list(k), v] for k, v in series.items()] for name, series in merged.items()}, f)
+    os.replace(f'{exited}.tmp', exited)
+    if os.path.exists(path):
+        os.remove(path)
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+def create_registry():
+    registry = MetricsRegistry()
+    registry.counter('http_requests_total', 'Requests handled, by route and status', ('method', 'route', 'status'))
+    registry.histogram('http_request_duration_seconds', 'Time until the response headers are ready',
+                       ('method', 'route'), LATENCY_BUCKETS)
+    registry.histogram('http_response_size_bytes', 'Size of the response bodies not streamed',
+                       ('route',), SIZE_BUCKETS)
+    registry.counter('rate_limit_rejections_total', 'Requests refused by the rate limiter', ('route',))
+    registry.histogram('mongo_command_duration_seconds', 'MongoDB command round trips, driver side',
+                       ('command', 'collection', 'outcome'), MONGO_BUCKETS)
+    return registry
+
+class MongoCommandTimer(monitoring.CommandListener):
+    def __init__(self, registry):
+        """
+        Driver event listener timing every MongoDB command by name and collection
+
+        Passed to the MongoClient through `event_listeners`; durations are the
+        ones measured by pymongo, from sending the command to its reply.
+
+        Args:
+            registry: MetricsRegistry receiving the observations
+        """
+        self.registry = registry
+        # (request id, connection) -> collection, filled on start and read on completion
+        self.pending = {}
+
+    def started(self, event):
+        if len(self.pending) > 10000:
+            # Completion events lost on a dropped connection; never let the map grow unbounded
+            self.pending.clear()
+        target = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        self.pending[(event.request_id, event.connection_id)] = target if isinstance(target, str) else ''
+
+    def _record(self, event, outcome):
+        collection = self.pending.pop((event.request_id, event.connection_id), '')
+        self.registry.observe('mongo_command_duration_seconds', (event.command_name, collection, outcome),
+                              event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._record(event, 'ok')
+
+    def failed(self, event):
+        self._record(event, 'error')
+
+def record_request(registry, method, route, status, elapsed, size=None):
+    """Count one answered request; also called by the ASGI app for the routes it serves"""
+    registry.inc('http_requests_total', (method, route, str(status)))
+    registry.observe('http_request_duration_seconds', (method, route), elapsed)
+    if size is not None:
+        registry.observe('http_response_size_bytes', (route,), size)
+    if status == 429:
+        registry.inc('rate_limit_rejections_total', (route,))
+
+def add_metrics(app: Flask):
+    """
+    Record request latency, response sizes, rate limiter rejections and MongoDB
+    command timings, and serve them on /metrics in the Prometheus format
+
+    Must run before mongo.init_app(): the command listener is handed to the
+    MongoClient through the MONGO_EVENT_LISTENERS setting.
+
+    Settings:
+        METRICS_DIR: Directory shared by the gunicorn workers for their snapshots
+        PROFILE_SAMPLE_RATE: Share of requests run under cProfile, 0 disables it
+        PROFILE_DIR: Where the sampled profiles are written as .prof files
+    """
+    registry = create_registry()
+    registry.directory = app.config.get('METRICS_DIR')
+    if registry.directory:
+        os.makedirs(registry.directory, exist_ok=True)
+    app.config.setdefault('MONGO_EVENT_LISTENERS', []).append(MongoCommandTimer(registry))
+    app.extensions['metrics'] = registry
+
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    profile_dir = app.config.get('PROFILE_DIR')
+    if sample_rate:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if sample_rate and random.random() < sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                g.profiler = profiler
+            except ValueError:
+                # Another profiler is already running in this process
+                pass
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # Route template, not the path, so ids in URLs do not create one series each
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        size = response.content_length if not response.is_streamed else None
+        record_request(registry, request.method, route, response.status_code, elapsed, size)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            name = f"{(request.endpoint or 'unmatched').replace('.', '_')}_{int(time.time() * 1000)}_{os.getpid()}.prof"
+            try:
+                profiler.dump_stats(os.path.join(profile_dir, name))
+            except OSError as e:
+                logger.warning(f'Could not write profile: {e}')
+        registry.flush()
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+    return app
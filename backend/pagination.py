@@ -0,0 +1,141 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pymongo import DESCENDING
+
+class PaginationError(ValueError):
+    """Raised when a pagination or filter parameter cannot be parsed"""
+
+def parse_limit(value, default=50, maximum=500):
+    """Parse the `limit` query parameter, bounded to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError('Paramètre limit invalide')
+    if limit < 1:
+        raise PaginationError('Paramètre limit invalide')
+    return min(limit, maximum)
+
+def parse_fields(value, allowed):
+    """
+    Parse a comma-separated `fields` parameter into a list of allowed fields
+
+    Returns:
+        list or None: None when every field is requested
+    """
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise PaginationError(f'Champs inconnus: {", ".join(unknown)}')
+    return fields
+
+def parse_date(value, end_of_day=False):
+    """
+    Parse an ISO date or datetime query parameter
+
+    Args:
+        value: 'YYYY-MM-DD' or a full ISO 8601 datetime
+        end_of_day: For a bare date, return the start of the following day
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f'Date invalide: {value}')
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def date_range_filter(date_from, date_to):
+    """Build a Mongo range filter from the `from`/`to` query parameters"""
+    start = parse_date(date_from)
+    end = parse_date(date_to, end_of_day=True)
+    cond = {}
+    if start:
+        cond['$gte'] = start
+    if end:
+        # A bare `to` date is inclusive: everything before the next midnight
+        cond['$lt' if date_to and len(date_to) == 10 else '$lte'] = end
+    return cond
+
+def encode_cursor(sort_value, doc_id):
+    """Encode the (sort value, _id) keyset position of a document"""
+    kind = 'o' if isinstance(doc_id, ObjectId) else 's'
+    raw = json.dumps([sort_value.isoformat(), kind, str(doc_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, kind, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), ObjectId(doc_id) if kind == 'o' else doc_id
+    except Exception:
+        raise PaginationError('Curseur invalide')
+
+def keyset_filter(sort_field, after):
+    """Filter selecting documents strictly after a cursor in (sort_field, _id) DESC order"""
+    sort_value, doc_id = decode_cursor(after)
+    return {'$or': [
+        {sort_field: {'$lt': sort_value}},
+        {sort_field: sort_value, '_id': {'$lt': doc_id}}
+    ]}
+
+def api_shape(fields):
+    """
+    $project stage turning stored documents into their API form
+
+    `_id` becomes `id` (an ObjectId, written as a string by the JSON
+    provider) followed by `fields` in order, null when missing, so the
+    driver returns documents that can be sent as they are.
+    """
+    stage = {'_id': 0, 'id': '$_id'}
+    for field in fields:
+        stage[field] = {'$ifNull': [f'${field}', None]}
+    return {'$project': stage}
+
+def shaped(collection, query, sort_field, fields, limit=None):
+    """Cursor over documents in API form, in (sort_field, _id) descending order"""
+    pipeline = [{'$match': query}, {'$sort': {sort_field: DESCENDING, '_id': DESCENDING}}]
+    if limit is not None:
+        pipeline.append({'$limit': limit})
+    pipeline.append(api_shape(fields))
+    return collection.aggregate(pipeline)
+
+def paginate(collection, query, sort_field, limit, fields, after=None):
+    """
+    Fetch one page of documents in API form, in (sort_field, _id) descending order
+
+    Args:
+        collection: Mongo collection to query
+        query: Filter applied before the cursor
+        sort_field: Timestamp field the keyset is built on
+        limit: Page size
+        fields: Fields of the returned documents (see api_shape)
+        after: Cursor returned by the previous page, if any
+
+    Returns:
+        tuple: (list of documents, cursor for the next page or None)
+    """
+    if after:
+        query = {'$and': [query, keyset_filter(sort_field, after)]} if query else keyset_filter(sort_field, after)
+    # The cursor needs the sort value of the last document, even when it was not requested
+    hidden = sort_field not in fields
+    docs = list(shaped(collection, query, sort_field, fields + [sort_field] if hidden else fields, limit + 1))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last[sort_field], last['id'])
+    if hidden:
+        for doc in docs:
+            del doc[sort_field]
+    return docs, next_cursor
@@ -1,61 +1,166 @@
 import time
-from collections import defaultdict, deque
+import inspect
+import logging
+from datetime import datetime
 from functools import wraps
-from flask import request, jsonify
+from flask import current_app, request, jsonify
+from pymongo import ReturnDocument
+from client_address import get_client_key
 import threading
 
+logger = logging.getLogger(__name__)
+
+def sliding_window_estimate(previous, current, elapsed, window):
+    """
+    Sliding-window counter: weight the previous fixed window by the share of
+    it still covered by the sliding window, and add the current one
+    """
+    return previous * (1 - elapsed / window) + current
+
+class MemoryBackend:
+    def __init__(self, stripes=16, sweep_interval=60):
+        """
+        Process-local counters with one lock per stripe of keys
+
+        Each key costs one small list (window index, current count, previous
+        count, window), whatever the request rate. Keys idle for two windows
+        are swept at most every `sweep_interval` seconds per stripe.
+        """
+        self.stripes = [({}, threading.Lock(), [0.0]) for _ in range(stripes)]
+        self.sweep_interval = sweep_interval
+
+    def hit(self, key, limit, window, now):
+        counters, lock, last_sweep = self.stripes[hash(key) % len(self.stripes)]
+        index = int(now // window)
+        with lock:
+            if now - last_sweep[0] >= self.sweep_interval:
+                self._sweep(counters, now)
+                last_sweep[0] = now
+
+            entry = counters.get(key)
+            if entry is None:
+                entry = counters[key] = [index, 0, 0, window]
+            elif entry[0] != index:
+                # Roll the window; after a gap of more than one window the previous count is stale
+                entry[2] = entry[1] if entry[0] == index - 1 else 0
+                entry[0], entry[1] = index, 0
+
+            if sliding_window_estimate(entry[2], entry[1], now - index * window, window) >= limit:
+                return False
+            entry[1] += 1
+            return True
+
+    def _sweep(self, counters, now):
+        for key in [k for k, (index, _, _, window) in counters.items() if now // window - index >= 2]:
+            del counters[key]
+
+    def __len__(self):
+        return sum(len(counters) for counters, _, _ in self.stripes)
+
+class MongoBackend:
+    def __init__(self, get_collection):
+        """
+        Counters shared by every worker and node through a Mongo collection
+
+        One document per key and fixed window, removed by the TTL index on
+        `expiresAt` (see indexes.py) once the window can no longer be read.
+
+        Args:
+            get_collection: Callable returning the collection, so the
+                connection is only opened on the first rate limited request
+        """
+        self.get_collection = get_collection
+
+    def hit(self, key, limit, window, now):
+        collection = self.get_collection()
+        index = int(now // window)
+        current = collection.find_one_and_update(
+            {'_id': f'{key}:{window}:{index}'},
+            {'$inc': {'count': 1},
+             '$setOnInsert': {'expiresAt': datetime.utcfromtimestamp((index + 2) * window)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        previous = collection.find_one({'_id': f'{key}:{window}:{index - 1}'}, {'count': 1})
+        # The current hit is already counted, so compare the estimate before it
+        estimate = sliding_window_estimate(
+            previous['count'] if previous else 0, current['count'] - 1, now - index * window, window
+        )
+        return estimate < limit
+
+class AsyncMongoBackend(MongoBackend):
+    """MongoBackend for an AsyncMongoClient collection, used by the ASGI ingestion app"""
+
+    async def hit(self, key, limit, window, now):
+        collection = self.get_collection()
+        index = int(now // window)
+        current = await collection.find_one_and_update(
+            {'_id': f'{key}:{window}:{index}'},
+            {'$inc': {'count': 1},
+             '$setOnInsert': {'expiresAt': datetime.utcfromtimestamp((index + 2) * window)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        previous = await collection.find_one({'_id': f'{key}:{window}:{index - 1}'}, {'count': 1})
+        estimate = sliding_window_estimate(
+            previous['count'] if previous else 0, current['count'] - 1, now - index * window, window
+        )
+        return estimate < limit
+
 class RateLimiter:
-    def __init__(self):
-        self.requests = defaultdict(deque)
-        self.lock = threading.Lock()
-    
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+
     def is_allowed(self, key, limit=10, window=60):
         """
         Check if request is allowed based on rate limiting
-        
+
         Args:
             key: Identifier for the client (IP address)
             limit: Maximum number of requests allowed
             window: Time window in seconds
-        
+
         Returns:
             bool: True if request is allowed, False otherwise
         """
-        now = time.time()
-        
-        with self.lock:
-            # Clean old requests outside the window
-            while self.requests[key] and self.requests[key][0] <= now - window:
-                self.requests[key].popleft()
-            
-            # Check if limit is exceeded
-            if len(self.requests[key]) >= limit:
-                return False
-            
-            # Add current request
-            self.requests[key].append(now)
+        try:
+            return self.backend.hit(key, limit, window, time.time())
+        except Exception as e:
+            # Fail open: an unreachable shared store must not block registrations
+            logger.error(f'Rate limiter backend error: {e}')
             return True
 
-# Global rate limiter instance
-rate_limiter = RateLimiter()
+    async def is_allowed_async(self, key, limit=10, window=60):
+        """Same as is_allowed, awaiting backends whose hit() is a coroutine"""
+        try:
+            allowed = self.backend.hit(key, limit, window, time.time())
+            return await allowed if inspect.isawaitable(allowed) else allowed
+        except Exception as e:
+            logger.error(f'Rate limiter backend error: {e}')
+            return True
 
-def rate_limit(limit=10, window=60):
+def rate_limit(limit=10, window=60, setting=None):
     """
     Decorator for rate limiting endpoints
-    
+
+    Uses the RateLimiter create_app() stores in app.extensions['rate_limiter'].
+
     Args:
         limit: Maximum number of requests allowed
         window: Time window in seconds
+        setting: App config key overriding `limit`, e.g. RATE_LIMIT_REGISTER
     """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Use IP address as key
-            client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
-            
-            if not rate_limiter.is_allowed(client_ip, limit, window):
+            # Use the resolved client address as key, one bucket per endpoint
+            client_key = get_client_key()
+            allowed = current_app.config.get(setting, limit) if setting else limit
+
+            if not current_app.extensions['rate_limiter'].is_allowed(f'{request.endpoint}:{client_key}', allowed, window):
+                logger.warning(f'Rate limit exceeded on {request.endpoint} for {client_key}')
                 return jsonify({"error": "Trop de requêtes"}), 429
-            
+
             return f(*args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
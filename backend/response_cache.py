@@ -0,0 +1,47 @@
+import threading
+from collections import OrderedDict
+
+class ResponseCache:
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024):
+        """
+        Process-local LRU of rendered GET bodies, keyed by request path
+
+        Each entry remembers the ETag it was rendered for; a lookup with a
+        different ETag is a miss, so a body is never served once the dataset
+        version behind it has moved on. clear() drops everything after a write.
+
+        Args:
+            max_entries: Number of bodies kept
+            max_bytes: Total size of the kept bodies, least recently used first out
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, etag):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, etag, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self.entries[key] = (etag, body)
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -0,0 +1,210 @@
+import re
+import time
+import threading
+import unicodedata
+import logging
+from array import array
+from functools import lru_cache
+from collections import Counter
+from itertools import chain
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+SNIPPET_CHARS = 160
+
+@lru_cache(maxsize=4096)
+def fold_char(c):
+    """Lowercase base letter of a character, accents removed, always one character long"""
+    base = unicodedata.normalize('NFKD', c)[0].lower()
+    return base[0] if base else c
+
+def fold(text):
+    """Accent- and case-insensitive form of a text, with the same length as the input"""
+    return ''.join(fold_char(c) for c in text)
+
+def trigrams(text):
+    """Set of padded word trigrams, so word order and accents do not matter"""
+    grams = set()
+    for word in WORD_RE.findall(fold(text)):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TrigramIndex:
+    def __init__(self, get_collection, fields, sort_field, ttl=5.0, lookback=60.0):
+        """
+        In-process trigram index over short name fields for fuzzy matching
+
+        Postings are compact int arrays of document positions. Each refresh
+        reads the documents whose `sort_field` is at most `lookback` seconds
+        older than the newest one indexed, skipping ids already seen, so
+        documents committed slightly out of timestamp order are not missed.
+        A new index is built on a background thread and swapped in once
+        complete when the collection holds fewer documents than were seen
+        (deletions), or when documents it already held at the previous
+        refresh are still missing (older than the window). Documents inserted
+        since a refresh are left to the next one. Refreshes happen at most
+        every `ttl` seconds, on the search path.
+
+        Args:
+            get_collection: Callable returning the Mongo collection
+            fields: Fields concatenated into the indexed text, e.g. prenom and nom
+            sort_field: Insertion timestamp used as the watermark
+            ttl: Seconds between two refreshes
+            lookback: Seconds re-read behind the watermark on every refresh
+        """
+        self.get_collection = get_collection
+        self.fields = fields
+        self.sort_field = sort_field
+        self.ttl = ttl
+        self.lookback = timedelta(seconds=lookback)
+        self.lock = threading.Lock()
+        self.refreshed_at = 0.0
+        # (ids, sizes, postings, seen ids) swapped as a whole, so searches never see a half-built index
+        self.state = self._empty()
+        self.watermark = None
+        # Collection size at the previous refresh, None right after a build
+        self.counted = None
+        self.rebuilding = None
+
+    @staticmethod
+    def _empty():
+        return [], array('H'), {}, set()
+
+    def __len__(self):
+        return len(self.state[0])
+
+    @staticmethod
+    def _add(state, doc_id, text):
+        ids, sizes, postings = state[:3]
+        grams = trigrams(text)
+        if not grams:
+            return
+        # Position first, postings last: a concurrent search only finds complete entries
+        position = len(ids)
+        ids.append(doc_id)
+        sizes.append(min(len(grams), 65535))
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('i')
+            posting.append(position)
+
+    def refresh(self, force=False):
+        """
+        Index new documents, and start a rebuild when documents went missing
+
+        Args:
+            force: Refresh now, and rebuild synchronously if needed
+        """
+        if not force and time.monotonic() - self.refreshed_at < self.ttl:
+            return
+        with self.lock:
+            if not force and time.monotonic() - self.refreshed_at < self.ttl:
+                return
+            collection = self.get_collection()
+            self.watermark = self._load(collection, self.state, self.watermark)
+            # Documents without trigrams are counted too: they are in `seen`. The count is metadata
+            # based and may include inserts made after the load, so one shortfall alone is not acted on
+            seen, count = len(self.state[3]), collection.estimated_document_count()
+            missed = seen > count or (self.counted is not None and seen < self.counted)
+            self.counted = count
+            if missed:
+                if force:
+                    self.state, self.watermark = self._build(collection)
+                    self.counted = None
+                elif self.rebuilding is None or not self.rebuilding.is_alive():
+                    logger.info(f'Rebuilding trigram index on {collection.name}')
+                    self.rebuilding = threading.Thread(target=self._rebuild, name=f'trigram-{collection.name}',
+                                                       daemon=True)
+                    self.rebuilding.start()
+            self.refreshed_at = time.monotonic()
+
+    def _build(self, collection):
+        state = self._empty()
+        return state, self._load(collection, state, None)
+
+    def _rebuild(self):
+        # Built without the lock, so searches and refreshes go on with the current index meanwhile
+        try:
+            collection = self.get_collection()
+            state, watermark = self._build(collection)
+            with self.lock:
+                # Catch up with the documents inserted during the build, then swap
+                self.state, self.watermark = state, self._load(collection, state, watermark)
+                self.counted = None
+        except Exception as e:
+            logger.error(f'Trigram index rebuild failed, will retry on a later refresh: {e}')
+
+    def _load(self, collection, state, watermark):
+        """Index the documents not yet seen from `lookback` before `watermark` into `state` and return the new watermark"""
+        seen = state[3]
+        query = {} if watermark is None else {self.sort_field: {'$gte': watermark - self.lookback}}
+        projection = dict.fromkeys(self.fields + [self.sort_field], 1)
+        for doc in collection.find(query, projection):
+            timestamp = doc.get(self.sort_field)
+            if timestamp is not None and (watermark is None or timestamp > watermark):
+                watermark = timestamp
+            if doc['_id'] in seen:
+                continue
+            seen.add(doc['_id'])
+            self._add(state, doc['_id'], ' '.join(str(doc.get(f) or '') for f in self.fields))
+        return watermark
+
+    def search(self, query, limit=50, threshold=0.3):
+        """
+        Documents whose indexed text shares enough trigrams with the query
+
+        Returns:
+            list: (doc id, Dice similarity in [0, 1]) pairs, best first
+        """
+        ids, sizes, postings, _ = self.state
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared = Counter(chain.from_iterable(postings[g] for g in grams if g in postings))
+        # Candidates below this overlap cannot reach the threshold, whatever their size
+        minimum = threshold * len(grams) / 2
+        scored = []
+        for position, count in shared.items():
+            if count >= minimum:
+                score = 2 * count / (len(grams) + sizes[position])
+                if score >= threshold:
+                    scored.append((score, position))
+        scored.sort(reverse=True)
+        return [(ids[position], round(score, 4)) for score, position in scored[:limit]]
+
+def query_terms(query):
+    """Folded search words, trimmed like a light stemmer so `ecoles` still matches `école`"""
+    terms = []
+    for word in WORD_RE.findall(fold(query)):
+        if len(word) >= 2:
+            terms.append(word[:max(3, len(word) - 2)])
+    return terms
+
+def highlight(text, terms, width=SNIPPET_CHARS):
+    """
+    Snippet of `text` around the first matching word
+
+    Returns:
+        dict or None: `snippet` and the `matches` [start, end] offsets inside it
+    """
+    if not text or not terms:
+        return None
+    folded = fold(text)
+    spans = [(m.start(), m.end()) for m in WORD_RE.finditer(folded)
+             if any(m.group().startswith(t) for t in terms)]
+    if not spans:
+        return None
+    start = max(0, spans[0][0] - width // 4)
+    end = min(len(text), start + width)
+    snippet = text[start:end]
+    offset = 0
+    if start > 0:
+        snippet, offset = '…' + snippet, 1
+    if end < len(text):
+        snippet += '…'
+    matches = [[s - start + offset, e - start + offset] for s, e in spans if s >= start and e <= end]
+    return {'snippet': snippet, 'matches': matches}
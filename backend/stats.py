@@ -0,0 +1,102 @@
+import time
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = 'inconnu'
+
+STUDENT_FACETS = {
+    'total': [{'$count': 'count'}],
+    'byStatus': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+    'byNiveau': [{'$group': {'_id': '$niveau', 'count': {'$sum': 1}}}],
+    'byDepartement': [{'$group': {'_id': '$departement', 'count': {'$sum': 1}}}],
+    'byAge': [{'$group': {'_id': '$age', 'count': {'$sum': 1}}}],
+    'perDay': [
+        {'$match': {'registeredAt': {'$type': 'date'}}},
+        {'$group': {'_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$registeredAt'}},
+                    'count': {'$sum': 1}}},
+        {'$sort': {'_id': 1}},
+    ],
+}
+
+MESSAGE_FACETS = {
+    'total': [{'$count': 'count'}],
+    'byStatus': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+    'byInterest': [{'$group': {'_id': '$interest', 'count': {'$sum': 1}}}],
+}
+
+def facet_counts(collection, facets, projection):
+    """
+    Run every facet in one aggregation over the fields it needs
+
+    Returns:
+        dict: `total` as an int, every other facet as {value: count}
+    """
+    pipeline = [{'$project': projection}, {'$facet': facets}]
+    result = next(collection.aggregate(pipeline), {})
+    out = {}
+    for name in facets:
+        buckets = result.get(name, [])
+        if name == 'total':
+            out[name] = buckets[0]['count'] if buckets else 0
+        else:
+            out[name] = {str(b['_id']) if b['_id'] is not None else UNKNOWN: b['count'] for b in buckets}
+    return out
+
+def dashboard_stats(db):
+    """Counters shown on the admin dashboard, one aggregation per collection"""
+    return {
+        'students': facet_counts(db.students, STUDENT_FACETS,
+                                 {'status': 1, 'niveau': 1, 'departement': 1, 'age': 1, 'registeredAt': 1}),
+        'messages': facet_counts(db.messages, MESSAGE_FACETS, {'status': 1, 'interest': 1}),
+        'timestamp': datetime.utcnow().isoformat(),
+    }
+
+class StatsCache:
+    def __init__(self, compute, ttl=30.0, min_age=5.0):
+        """
+        Keep the last computed statistics for a short time
+
+        Writes handled by this process call invalidate(), which only marks the
+        result stale: it is still served until it is `min_age` seconds old, so
+        a burst of writes costs one aggregation per `min_age` instead of one
+        per read. Writes from other workers show up once the TTL expires.
+
+        Args:
+            compute: Callable returning the statistics
+            ttl: Number of seconds a result is reused
+            min_age: Number of seconds a stale result is still reused
+        """
+        self.compute = compute
+        self.ttl = ttl
+        self.min_age = min_age
+        self.lock = threading.Lock()
+        self.value = None
+        self.computed_at = 0.0
+        self.stale = False
+        self.generation = 0
+
+    def expired(self):
+        age = time.monotonic() - self.computed_at
+        return self.value is None or age >= self.ttl or (self.stale and age >= self.min_age)
+
+    def get(self):
+        if not self.expired():
+            return self.value
+
+        with self.lock:
+            # Another thread may have refreshed the result while we waited
+            if self.expired():
+                generation = self.generation
+                value = self.compute()
+                self.value, self.computed_at = value, time.monotonic()
+                # A write during the computation may be missing from the result
+                self.stale = generation != self.generation
+                return value
+            return self.value
+
+    def invalidate(self):
+        self.generation += 1
+        self.stale = True
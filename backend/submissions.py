@@ -0,0 +1,152 @@
+"""
+Write path of the public submission endpoints, POST /api/register and POST /api/contact
+
+Shared by the Flask routes in app.py and the ASGI app in asgi_ingest.py, so
+both front ends validate and build the same documents, honour
+INGEST_MODE=buffered and run the same hooks once a document is stored, the
+background near-duplicate check among them. Only the insert itself differs:
+a blocking insert_one in Flask, an awaited AsyncMongoClient insert_one in ASGI.
+"""
+import uuid
+import logging
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from archive import current_edition
+from duplicates import blocking_keys
+from input_validator import STUDENT_SCHEMA, CONTACT_SCHEMA, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+def new_student_doc(cleaned, edition):
+    """Student document stored for a validated registration to camp `edition`"""
+    cleaned['registeredAt'] = datetime.utcnow()
+    cleaned['status'] = 'pending'
+    cleaned['edition'] = edition
+    # Lets later registrations find this one as a near duplicate before it is checked itself
+    cleaned['telephoneNormalized'] = normalize_phone(cleaned.get('telephone'))
+    cleaned['dedupKeys'] = blocking_keys(cleaned)
+    return cleaned
+
+def new_contact_doc(cleaned, edition):
+    """Message document stored for a validated contact form sent during camp `edition`"""
+    return {
+        '_id': str(uuid.uuid4()),
+        **cleaned,
+        'createdAt': datetime.utcnow(),
+        'status': 'new',
+        'edition': edition
+    }
+
+def log_bump_error(collection, error):
+    logger.error(f'Could not bump the {collection} version, ETags may stay stale until the next write: {error}')
+
+def after_write(extensions, collection, bump=True):
+    """
+    Hooks run once documents of `collection` changed, whatever wrote them
+
+    The collection's write counter moves on, which changes the ETag of every
+    list and export built from it in all processes, the cached dashboard
+    and list bodies of this process become stale, and new students are
+    queued for the background duplicate check.
+
+    Args:
+        extensions: app.extensions of the Flask app
+        collection: 'students' or 'messages'
+        bump: False when the caller already bumped the counter, e.g. the
+            ASGI app through its async client
+    """
+    if bump:
+        try:
+            extensions['versions'].bump(collection)
+        except Exception as e:
+            log_bump_error(collection, e)
+    extensions['stats'].invalidate()
+    extensions['response_cache'].clear()
+    if collection == 'students':
+        # Near duplicates are flagged for review after the response, never rejected
+        extensions['duplicates'].schedule()
+
+class Submissions:
+    def __init__(self, config, extensions):
+        """
+        Args:
+            config: app.config of the Flask app, for CAMP_EDITION
+            extensions: app.extensions of the Flask app, for the ingest
+                queue, the duplicate detector and the caches
+        """
+        self.config = config
+        self.extensions = extensions
+
+    @property
+    def ingest_queue(self):
+        return self.extensions.get('ingest_queue')
+
+    def prepare(self, collection, data):
+        """
+        Validate a submission and build its document
+
+        In buffered mode the document is journaled here and the request is
+        answered with 202; it is stored later by the ingest flusher.
+
+        Args:
+            collection: 'students' or 'messages'
+            data: Parsed JSON body, None when it could not be parsed
+
+        Returns:
+            tuple: (document to insert, None), or (None, (status, body)) when
+                the request is already answered
+        """
+        edition = current_edition(self.config.get('CAMP_EDITION'))
+        if collection == 'students':
+            cleaned, errors = STUDENT_SCHEMA.validate(data)
+            if errors:
+                return None, (400, {'error': STUDENT_SCHEMA.error_message(errors), 'errors': errors})
+            doc = new_student_doc(cleaned, edition)
+        else:
+            cleaned, errors = CONTACT_SCHEMA.validate(data)
+            if errors:
+                return None, (400, {'error': CONTACT_SCHEMA.error_message(errors), 'errors': errors})
+            doc = new_contact_doc(cleaned, edition)
+
+        ingest_queue = self.ingest_queue
+        if ingest_queue is None:
+            return doc, None
+        if collection == 'students':
+            doc['_id'] = ObjectId()
+            submission_id = ingest_queue.enqueue('students', doc)
+            return None, (202, {'message': 'Inscription reçue, enregistrement en cours',
+                                'studentId': submission_id, 'submissionId': submission_id})
+        submission_id = ingest_queue.enqueue('messages', doc)
+        return None, (202, {'message': 'Message reçu, enregistrement en cours',
+                            'messageId': submission_id, 'submissionId': submission_id})
+
+    def stored(self, collection, doc, bump=True):
+        """
+        Post-write hooks of a document inserted by insert_one
+
+        Only in-memory work once the version counter is bumped, so the ASGI
+        app calls it on the event loop with `bump=False`.
+
+        Returns:
+            tuple: (status, body) of the response
+        """
+        after_write(self.extensions, collection, bump)
+        if collection == 'messages':
+            return 201, {'message': 'Message envoyé avec succès', 'messageId': doc['_id']}
+        return 201, {'message': 'Inscription enregistrée avec succès', 'studentId': str(doc['_id'])}
+
+    def failed(self, collection, error):
+        """
+        Response for an insert_one that raised `error`
+
+        Returns:
+            tuple: (status, body) of the response
+        """
+        if collection == 'messages':
+            logger.error(f'Contact insert error: {error}')
+            return 500, {'error': 'Erreur lors de la sauvegarde'}
+        if isinstance(error, DuplicateKeyError):
+            return 400, {'error': 'Cette adresse email est déjà utilisée'}
+        logger.error(f'Insert error: {error}')
+        return 500, {'error': 'Erreur interne du serveur'}
@@ -0,0 +1,28 @@
+class DatasetVersions:
+    def __init__(self, get_collection):
+        """
+        Write counters of the students and messages collections
+
+        One document per collection, `{_id: name, version: n}`, incremented
+        after every write the API makes to it (submissions, ingest flushes,
+        bulk imports, admin updates and deletes, merges, archiving). List and
+        export ETags are built from it, so answering a conditional GET costs
+        a single lookup by _id whatever the size of the collection.
+
+        Args:
+            get_collection: Callable returning the Mongo collection of the
+                counters, an AsyncMongoClient one for bump_async()
+        """
+        self.get_collection = get_collection
+
+    def get(self, name):
+        doc = self.get_collection().find_one({'_id': name}, {'version': 1})
+        return doc['version'] if doc else 0
+
+    def bump(self, name):
+        """Record a write to collection `name`"""
+        self.get_collection().update_one({'_id': name}, {'$inc': {'version': 1}}, upsert=True)
+
+    async def bump_async(self, name):
+        """bump() awaited on an async collection"""
+        await self.get_collection().update_one({'_id': name}, {'$inc': {'version': 1}}, upsert=True)
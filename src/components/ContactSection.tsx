@@ -82,7 +82,7 @@ const ContactSection = () => {
       
       // Test de connectivité d'abord
       try {
-        const healthCheck = await fetch(`${API_URL}/api/health`, {
+        const healthCheck = await fetch(`${API_URL}/api/health/live`, {
           method: 'GET',
           headers: {
             'Accept': 'application/json',
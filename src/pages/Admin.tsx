@@ -38,12 +38,18 @@ interface Message {
   status: 'new' | 'read' | 'replied';
 }
 
+interface DashboardStats {
+  students: { total: number; byStatus: Record<string, number> };
+  messages: { total: number; byStatus: Record<string, number> };
+}
+
 const Admin: React.FC = () => {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [loginForm, setLoginForm] = useState({ username: '', password: '' });
   const [loginError, setLoginError] = useState('');
   const [students, setStudents] = useState<Student[]>([]);
   const [messages, setMessages] = useState<Message[]>([]);
+  const [dashboardStats, setDashboardStats] = useState<DashboardStats | null>(null);
   const [loading, setLoading] = useState(false);
   const [selectedStudent, setSelectedStudent] = useState<Student | null>(null);
   const [selectedMessage, setSelectedMessage] = useState<Message | null>(null);
@@ -61,6 +67,38 @@ const Admin: React.FC = () => {
     }
   }, []);
 
+  // Flux des modifications : les changements sont appliqués sans recharger les listes
+  useEffect(() => {
+    if (!isAuthenticated) return;
+    const source = new EventSource(`${API_URL}/api/changes`);
+    let statsTimer: ReturnType<typeof setTimeout> | undefined;
+
+    source.addEventListener('change', (e) => {
+      const change = JSON.parse((e as MessageEvent).data);
+      if (change.type === 'resync') {
+        fetchData();
+        return;
+      }
+      const apply = <T extends { id: string }>(prev: T[]): T[] => {
+        if (change.type === 'delete') return prev.filter(item => item.id !== change.id);
+        if (!change.document) return prev;
+        if (prev.some(item => item.id === change.id)) {
+          return prev.map(item => item.id === change.id ? change.document : item);
+        }
+        return change.type === 'insert' ? [change.document, ...prev] : prev;
+      };
+      if (change.collection === 'students') setStudents(apply);
+      if (change.collection === 'messages') setMessages(apply);
+      clearTimeout(statsTimer);
+      statsTimer = setTimeout(fetchStats, 1000);
+    });
+
+    return () => {
+      source.close();
+      clearTimeout(statsTimer);
+    };
+  }, [isAuthenticated]);
+
   const handleLogin = (e: React.FormEvent) => {
     e.preventDefault();
     setLoginError('');
@@ -88,6 +126,21 @@ const Admin: React.FC = () => {
     toast.success('Déconnexion réussie');
   };
 
+  // Compteurs calculés côté serveur (une seule petite réponse)
+  const fetchStats = async () => {
+    try {
+      const response = await fetch(`${API_URL}/api/stats`, {
+        headers: { 'Accept': 'application/json' },
+        signal: AbortSignal.timeout(15000),
+      });
+      if (response.ok) {
+        setDashboardStats(await response.json());
+      }
+    } catch (error) {
+      console.error('Error fetching stats:', error);
+    }
+  };
+
   const fetchData = async () => {
     try {
       setLoading(true);
@@ -96,7 +149,7 @@ const Admin: React.FC = () => {
       
       // Test de connectivité d'abord
       try {
-        const healthCheck = await fetch(`${API_URL}/api/health`, {
+        const healthCheck = await fetch(`${API_URL}/api/health/ready`, {
           method: 'GET',
           headers: {
             'Accept': 'application/json',
@@ -115,14 +168,17 @@ const Admin: React.FC = () => {
         console.error('Backend health check error:', healthError);
         toast.error('Le serveur semble indisponible. Certaines fonctionnalités peuvent ne pas fonctionner.');
       }
+
+      fetchStats();
       
       const studentsRes = await fetch(`${API_URL}/api/students`, {
         method: 'GET',
         headers: {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
-          'Cache-Control': 'no-cache',
         },
+        // Revalidation avec l'ETag : 304 sans corps si rien n'a changé
+        cache: 'no-cache',
         mode: 'cors',
         credentials: 'omit',
         signal: AbortSignal.timeout(45000),
@@ -133,8 +189,9 @@ const Admin: React.FC = () => {
         headers: {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
-          'Cache-Control': 'no-cache',
         },
+        // Revalidation avec l'ETag : 304 sans corps si rien n'a changé
+        cache: 'no-cache',
         mode: 'cors',
         credentials: 'omit',
         signal: AbortSignal.timeout(45000),
@@ -200,6 +257,7 @@ const Admin: React.FC = () => {
           )
         );
         toast.success('Statut mis à jour avec succès');
+        fetchStats();
         if (selectedStudent && selectedStudent.id === studentId) {
           setSelectedStudent({ ...selectedStudent, status: status as any });
         }
@@ -229,6 +287,7 @@ const Admin: React.FC = () => {
           )
         );
         toast.success('Statut du message mis à jour');
+        fetchStats();
       }
     } catch (error) {
       console.error('Error updating message status:', error);
@@ -247,6 +306,7 @@ const Admin: React.FC = () => {
       if (response.ok) {
         setStudents(prev => prev.filter(student => student.id !== studentId));
         toast.success('Étudiant supprimé avec succès');
+        fetchStats();
         if (selectedStudent && selectedStudent.id === studentId) {
           setSelectedStudent(null);
         }
@@ -270,6 +330,7 @@ const Admin: React.FC = () => {
       if (response.ok) {
         setMessages(prev => prev.filter(message => message.id !== messageId));
         toast.success('Message supprimé avec succès');
+        fetchStats();
         if (selectedMessage && selectedMessage.id === messageId) {
           setSelectedMessage(null);
         }
@@ -358,7 +419,14 @@ const Admin: React.FC = () => {
     return matchesStatus && matchesSearch;
   });
 
-  const stats = {
+  const stats = dashboardStats ? {
+    totalStudents: dashboardStats.students.total,
+    pendingStudents: dashboardStats.students.byStatus.pending || 0,
+    confirmedStudents: dashboardStats.students.byStatus.confirmed || 0,
+    rejectedStudents: dashboardStats.students.byStatus.rejected || 0,
+    totalMessages: dashboardStats.messages.total,
+    newMessages: dashboardStats.messages.byStatus.new || 0,
+  } : {
     totalStudents: students.length,
     pendingStudents: students.filter(s => s.status === 'pending').length,
     confirmedStudents: students.filter(s => s.status === 'confirmed').length,
@@ -135,7 +135,7 @@ const Inscription = () => {
       // Test de connectivité d'abord
       try {
         console.log('Testing backend connectivity...');
-        const healthCheck = await fetch(`${API_URL}/api/health`, {
+        const healthCheck = await fetch(`${API_URL}/api/health/live`, {
           method: 'GET',
           headers: {
             'Accept': 'application/json',